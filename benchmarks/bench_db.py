@@ -0,0 +1,212 @@
+"""
+DatabaseManager 基准测试
+在 1 万 / 10 万 / 100 万篇的合成语料上测量增删改查、搜索（含模糊搜索）、标题快速跳转、统计和分页列表，
+输出延迟分位数和吞吐量，并把结果保存为 JSON 基线，方便对比两次运行
+
+运行方式：
+python benchmarks/bench_db.py                              # 默认 1 万和 10 万篇
+python benchmarks/bench_db.py --sizes 10000 100000 1000000
+python benchmarks/bench_db.py --save results/before.json   # 保存基线
+python benchmarks/bench_db.py --compare results/before.json  # 与基线对比
+
+语料库会缓存在 --db-dir 目录（默认系统临时目录），同样大小和种子的库下次直接复用；
+写操作测完后会恢复原有篇数，但被更新过的日记内容会变化。
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import platform
+import sqlite3
+import argparse
+import tempfile
+from datetime import date, datetime
+from typing import Callable, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import DatabaseManager, pinyin_initials
+from corpus import generate_diaries, generate_diary, sample_keywords, sample_typos
+
+# 对比基线时，p50 变慢超过这个比例视为退化
+REGRESSION_RATIO = 1.2
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法求分位数（输入须已排序）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: List[float]) -> Dict:
+    """把每次调用的耗时（秒）汇总成毫秒分位数和每秒次数"""
+    values = sorted(samples)
+    total = sum(values)
+    return {
+        'count': len(values),
+        'p50_ms': percentile(values, 50) * 1000,
+        'p90_ms': percentile(values, 90) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': values[-1] * 1000 if values else 0.0,
+        'ops_per_sec': len(values) / total if total else 0.0,
+    }
+
+
+def measure(func: Callable, args_list: List[tuple]) -> Dict:
+    """依次用每组参数调用 func，记录耗时"""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def prepare_database(size: int, seed: int, db_dir: str) -> str:
+    """生成（或复用）指定大小的语料库，返回路径"""
+    path = os.path.join(db_dir, f"bench_{size}_{seed}.db")
+    if os.path.exists(path):
+        db = DatabaseManager(path)
+        existing = db.count_diaries()
+        db.close()
+        if existing == size:
+            print(f"  复用已有语料库 {path}")
+            return path
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    
+    db = DatabaseManager(path)
+    
+    def progress(done, rate):
+        print(f"\r  生成语料 {done}/{size} 篇 ({rate:.0f} 篇/秒)", end='', flush=True)
+    
+    db.add_diaries(generate_diaries(size, seed, date.today()), chunk_size=5000, progress=progress)
+    print()
+    db.close()
+    return path
+
+
+def bench_size(size: int, ops: int, seed: int, db_dir: str) -> Dict:
+    """在一个语料库上跑全部操作"""
+    path = prepare_database(size, seed, db_dir)
+    # 关闭 get_diary 缓存，测的是数据库本身
+    db = DatabaseManager(path, diary_cache_bytes=0)
+    rng = random.Random(seed + size)
+    max_id = db.get_connection().execute('SELECT MAX(id) FROM diaries').fetchone()[0]
+    existing_ids = [rng.randint(1, max_id) for _ in range(ops)]
+    results = {}
+    
+    # 写入：新增的日记最后再删掉，语料库篇数保持不变
+    new_rng = random.Random(seed - size)
+    new_diaries = [generate_diary(new_rng, date.today()) for _ in range(ops)]
+    added = []
+    
+    def add(diary):
+        added.append(db.add_diary(diary['title'], diary['content'], diary['mood'], diary['is_important']))
+    
+    results['add'] = measure(add, [(d,) for d in new_diaries])
+    results['get'] = measure(db.get_diary, [(i,) for i in existing_ids])
+    results['update'] = measure(
+        db.update_diary,
+        [(i, d['title'], d['content'], d['mood'], d['is_important']) for i, d in zip(added, reversed(new_diaries))]
+    )
+    results['delete'] = measure(db.delete_diary, [(i,) for i in added])
+    
+    # 搜索：前 50 条（界面实际只显示第一屏）和全部结果
+    keywords = sample_keywords(ops, seed)
+    results['search_top50'] = measure(db.search_diaries, [(k, 50) for k in keywords])
+    results['search_all'] = measure(db.search_diaries, [(k,) for k in keywords[:max(1, ops // 10)]])
+    results['fuzzy_top50'] = measure(db.fuzzy_search, [(k, None, 50) for k in sample_typos(ops, seed)])
+    
+    # 快速跳转：构建标题索引，再用标题开头的一两个字和拼音首字母查前 20 条
+    results['title_index_build'] = measure(db.load_title_index, [()])
+    titles = db.load_title_index()
+    sample_ids = rng.sample(sorted(titles.entries), min(ops, len(titles)))
+    prefixes = [titles.entries[i][0][:rng.randint(1, 2)] for i in sample_ids]
+    results['title_prefix'] = measure(titles.search, [(p,) for p in prefixes + [pinyin_initials(p) for p in prefixes]])
+    
+    results['statistics'] = measure(db.get_statistics, [()] * ops)
+    results['word_trend'] = measure(db.get_word_trend, [(30,)] * ops)
+    results['mood_distribution'] = measure(db.get_mood_distribution, [()] * ops)
+    
+    # 列表：第一页，以及顺着游标一直往后翻的每一页
+    results['list_first_page'] = measure(db.list_diaries, [(None, 200)] * ops)
+    page_samples = []
+    cursor = None
+    for _ in range(ops):
+        start = time.perf_counter()
+        page = db.list_diaries(cursor, 200)
+        page_samples.append(time.perf_counter() - start)
+        if not page:
+            break
+        cursor = db.page_cursor(page[-1])
+    results['list_next_page'] = summarize(page_samples)
+    results['count'] = measure(db.count_diaries, [()] * max(1, ops // 10))
+    
+    db.close()
+    return results
+
+
+def print_results(size: int, results: Dict, baseline: Dict = None):
+    """打印一个规模的结果表；有基线时附上 p50 变化"""
+    print(f"\n📊 {size:,} 篇")
+    print(f"  {'操作':<20}{'次数':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'次/秒':>11}")
+    for name, r in results.items():
+        line = (f"  {name:<20}{r['count']:>7}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}"
+                f"{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}{r['ops_per_sec']:>11.1f}")
+        old = (baseline or {}).get(name)
+        if old and old['p50_ms']:
+            ratio = r['p50_ms'] / old['p50_ms']
+            flag = '❌' if ratio > REGRESSION_RATIO else '✅'
+            line += f"  {flag} x{ratio:.2f}"
+        print(line)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="DatabaseManager 基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help="语料篇数")
+    parser.add_argument('--ops', type=int, default=200, help="每个操作的调用次数")
+    parser.add_argument('--seed', type=int, default=42, help="语料随机种子")
+    parser.add_argument('--db-dir', default=tempfile.gettempdir(), help="语料库缓存目录")
+    parser.add_argument('--save', help="把结果保存为 JSON 基线")
+    parser.add_argument('--compare', help="与之前保存的 JSON 基线对比")
+    args = parser.parse_args()
+    
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    
+    report = {
+        'meta': {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'ops': args.ops,
+            'schema_version': DatabaseManager.SCHEMA_VERSION,
+        },
+        'results': {},
+    }
+    
+    for size in args.sizes:
+        print(f"\n⏱️  {size:,} 篇 ...")
+        results = bench_size(size, args.ops, args.seed, args.db_dir)
+        report['results'][str(size)] = results
+        print_results(size, results, baseline.get(str(size)))
+    
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存到 {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+列表内存基准测试
+比较列表和搜索结果每行一个 dict（之前的做法）与紧凑的 DiaryRecord / DiarySearchRecord
+每行占用的内存，以及生成结果的耗时
+
+内存用 tracemalloc 统计，是结果列表在 Python 里实际占用的字节数（含标题、摘要等字符串），
+除以行数得到每行字节数。
+
+运行方式：
+python benchmarks/bench_memory.py                              # 默认 1 万和 10 万篇
+python benchmarks/bench_memory.py --sizes 100000 --save results/memory.json
+python benchmarks/bench_memory.py --compare results/memory.json
+"""
+
+import sys
+import os
+import gc
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import DatabaseManager, build_fts_query, split_snippet
+from bench_db import prepare_database
+
+# 对比基线时，每行字节数增加超过这个比例视为退化
+REGRESSION_RATIO = 1.1
+
+# 搜索用的关键词：语料里很常见，结果足够多
+SEARCH_KEYWORD = '图书馆'
+
+
+def measure(build: Callable[[], list]) -> Dict:
+    """调用 build 生成结果列表，返回行数、每行字节数和耗时（tracemalloc 会拖慢分配，耗时单独测）"""
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - start
+    
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    rows = len(result)
+    del result
+    return {
+        'rows': rows,
+        'bytes_per_row': current / rows if rows else 0.0,
+        'total_mb': current / 1024 / 1024,
+        'ms': seconds * 1000,
+    }
+
+
+def list_as_dicts(db: DatabaseManager) -> list:
+    """之前的 get_all_diaries：每行 dict(row)"""
+    return [dict(row) for row in db.get_connection().execute(DatabaseManager.LIST_SQL)]
+
+
+def search_as_dicts(db: DatabaseManager, keyword: str) -> list:
+    """之前的 search_diaries：每行 dict(row)，再加上摘要和命中位置"""
+    cursor = db.get_connection().execute('''
+        SELECT id, title, created_date, mood, is_important, search_snippet(plain_text, ?) AS snippet
+        FROM diaries
+        WHERE id IN (SELECT rowid FROM diaries_fts WHERE diaries_fts MATCH ?)
+    ''', (keyword, build_fts_query(keyword)))
+    diaries = []
+    for row in cursor:
+        diary = dict(row)
+        diary['snippet'], diary['highlights'] = split_snippet(diary['snippet'])
+        diaries.append(diary)
+    return diaries
+
+
+def bench_size(size: int, seed: int, db_dir: str) -> Dict:
+    """在一个语料库上比较两种表示"""
+    path = prepare_database(size, seed, db_dir)
+    db = DatabaseManager(path)
+    # 先执行一遍，语句缓存、页缓存和心情编号都准备好，不计入结果
+    list_as_dicts(db)
+    db.get_all_diaries()
+    db.search_diaries(SEARCH_KEYWORD, 10)
+    
+    results = {
+        'list_dict': measure(lambda: list_as_dicts(db)),
+        'list_record': measure(db.get_all_diaries),
+        'search_dict': measure(lambda: search_as_dicts(db, SEARCH_KEYWORD)),
+        'search_record': measure(lambda: db.search_diaries(SEARCH_KEYWORD)),
+    }
+    db.close()
+    return results
+
+
+def print_results(size: int, results: Dict, baseline: Dict = None):
+    """打印一个规模的结果表；有基线时附上每行字节数的变化"""
+    print(f"\n🧠 {size:,} 篇")
+    print(f"  {'结果':<16}{'行数':>9}{'字节/行':>10}{'总计 MB':>10}{'耗时 ms':>10}")
+    for name, r in results.items():
+        line = f"  {name:<16}{r['rows']:>9}{r['bytes_per_row']:>10.0f}{r['total_mb']:>10.1f}{r['ms']:>10.1f}"
+        old = (baseline or {}).get(name)
+        if old and old['bytes_per_row']:
+            ratio = r['bytes_per_row'] / old['bytes_per_row']
+            line += f"  {'❌' if ratio > REGRESSION_RATIO else '✅'} x{ratio:.2f}"
+        print(line)
+    for kind in ('list', 'search'):
+        before, after = results[f'{kind}_dict'], results[f'{kind}_record']
+        if before['bytes_per_row']:
+            print(f"  {kind}: 每行 {before['bytes_per_row']:.0f} → {after['bytes_per_row']:.0f} 字节"
+                  f"（{1 - after['bytes_per_row'] / before['bytes_per_row']:.0%} 更少）")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="列表内存基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help="语料篇数")
+    parser.add_argument('--seed', type=int, default=42, help="语料随机种子")
+    parser.add_argument('--db-dir', default=tempfile.gettempdir(), help="语料库缓存目录")
+    parser.add_argument('--save', help="把结果保存为 JSON 基线")
+    parser.add_argument('--compare', help="与之前保存的 JSON 基线对比")
+    args = parser.parse_args()
+    
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    
+    report = {
+        'meta': {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+    
+    for size in args.sizes:
+        print(f"\n⏱️  {size:,} 篇 ...")
+        results = bench_size(size, args.seed, args.db_dir)
+        report['results'][str(size)] = results
+        print_results(size, results, baseline.get(str(size)))
+    
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存到 {args.save}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""
+启动速度基准测试
+1. 导入耗时：用 python -X importtime 导入 main，列出累计耗时最多的模块
+2. 首次绘制时间：启动一个新进程创建并显示主窗口，记录从进程启动到窗口第一次绘制的时间
+
+每项重复多次取中位数，可保存为 JSON 基线并与之前的结果对比。
+子进程在临时目录里运行，不会碰到真实的日记数据库。
+
+运行方式：
+python benchmarks/bench_startup.py
+python benchmarks/bench_startup.py --runs 10 --save results/startup.json
+python benchmarks/bench_startup.py --compare results/startup.json
+python benchmarks/bench_startup.py --db mydiary_final.db   # 用已有的库测首次绘制（会复制一份）
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 对比基线时，中位数变慢超过这个比例视为退化
+REGRESSION_RATIO = 1.2
+
+# 在子进程中运行：显示主窗口，第一次绘制时打印各阶段耗时后退出
+FIRST_PAINT_SCRIPT = '''
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import main
+from PyQt6.QtCore import QObject, QEvent
+from PyQt6.QtWidgets import QApplication
+t_import = time.perf_counter()
+
+class PaintWatcher(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and not hasattr(self, 'done'):
+            self.done = True
+            print(json.dumps({{
+                'import_ms': (t_import - t0) * 1000,
+                'construct_ms': (t_window - t_import) * 1000,
+                'first_paint_ms': (time.perf_counter() - t0) * 1000,
+                'heavy_modules': sorted(m for m in ('matplotlib', 'reportlab') if m in sys.modules),
+            }}), flush=True)
+            app.quit()
+        return False
+
+app = QApplication(sys.argv)
+window = main.MyDiaryApp()
+t_window = time.perf_counter()
+watcher = PaintWatcher()
+window.installEventFilter(watcher)
+window.show()
+app.exec()
+window.close()
+'''
+
+
+def child_env(offscreen: bool) -> Dict:
+    """子进程环境：关闭后台预加载，无显示器时用 offscreen 平台"""
+    env = dict(os.environ, MYDIARY_WARMUP='0')
+    if offscreen:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    return env
+
+
+def measure_import(cwd: str, env: Dict, top: int) -> Dict:
+    """用 -X importtime 导入 main，返回总耗时和 main 直接导入的最慢的模块"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import sys; sys.path.insert(0, {ROOT!r}); import main'],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+    
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append((int(cumulative_us), int(self_us), name.rstrip()))
+    
+    main_entry = next((m for m in modules if m[2].strip() == 'main'), None)
+    # 每深一层多缩进两个空格，顶层模块前只有一个空格
+    direct = sorted((m for m in modules if len(m[2]) - len(m[2].lstrip()) == 3), reverse=True)
+    return {
+        'main_cumulative_ms': main_entry[0] / 1000 if main_entry else 0.0,
+        'top_modules': [
+            {'module': name.strip(), 'cumulative_ms': cum / 1000, 'self_ms': own / 1000}
+            for cum, own, name in direct[:top]
+        ],
+    }
+
+
+def measure_first_paint(cwd: str, env: Dict) -> Dict:
+    """启动一个子进程直到主窗口第一次绘制，返回各阶段耗时"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', FIRST_PAINT_SCRIPT.format(root=ROOT)],
+        cwd=cwd, env=env, capture_output=True, text=True, timeout=120,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    
+    for line in result.stdout.splitlines():
+        if line.startswith('{'):
+            timings = json.loads(line)
+            timings['process_ms'] = wall_ms
+            return timings
+    raise RuntimeError(f"子进程没有报告首次绘制：\n{result.stderr[-2000:]}")
+
+
+def median_of(runs: List[Dict], key: str) -> float:
+    """多次运行中某一项的中位数"""
+    return statistics.median(run[key] for run in runs)
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="MyDiary 启动速度基准测试")
+    parser.add_argument('--runs', type=int, default=5, help="重复次数")
+    parser.add_argument('--top', type=int, default=15, help="列出导入最慢的模块数")
+    parser.add_argument('--db', help="用这个数据库的副本测首次绘制（默认空库）")
+    parser.add_argument('--offscreen', action='store_true',
+                        default=sys.platform.startswith('linux') and not os.environ.get('DISPLAY'),
+                        help="使用 Qt offscreen 平台（无显示器时默认开启）")
+    parser.add_argument('--save', help="把结果保存为 JSON 基线")
+    parser.add_argument('--compare', help="与之前保存的 JSON 基线对比")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='mydiary_startup_')
+    if args.db:
+        shutil.copy(args.db, os.path.join(workdir, 'mydiary_final.db'))
+    env = child_env(args.offscreen)
+    
+    # 第一次运行会生成 .pyc 和空库，不计入结果
+    measure_first_paint(workdir, env)
+    
+    imports = [measure_import(workdir, env, args.top) for _ in range(args.runs)]
+    paints = [measure_first_paint(workdir, env) for _ in range(args.runs)]
+    
+    summary = {
+        'import_main_ms': statistics.median(r['main_cumulative_ms'] for r in imports),
+        'first_paint_ms': median_of(paints, 'first_paint_ms'),
+        'process_to_paint_ms': median_of(paints, 'process_ms'),
+        'window_construct_ms': median_of(paints, 'construct_ms'),
+    }
+    
+    print(f"\n📦 导入最慢的模块（第 1 次运行，累计 ms）")
+    for m in imports[0]['top_modules']:
+        print(f"  {m['cumulative_ms']:>9.1f}  {m['module']}")
+    print(f"\n  启动时已导入的重量级模块: {', '.join(paints[0]['heavy_modules']) or '无'}")
+    
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)['summary']
+    
+    print(f"\n⏱️  启动耗时（{args.runs} 次中位数）")
+    labels = {
+        'import_main_ms': 'import main',
+        'window_construct_ms': '创建主窗口',
+        'first_paint_ms': '进程内到首次绘制',
+        'process_to_paint_ms': '进程启动到首次绘制',
+    }
+    for key, label in labels.items():
+        line = f"  {label:<16}{summary[key]:>10.1f} ms"
+        if baseline.get(key):
+            ratio = summary[key] / baseline[key]
+            line += f"  {'❌' if ratio > REGRESSION_RATIO else '✅'} x{ratio:.2f}"
+        print(line)
+    
+    if args.save:
+        report = {
+            'meta': {
+                'time': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'runs': args.runs,
+                'db': args.db,
+            },
+            'summary': summary,
+            'imports': imports[0]['top_modules'],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已保存到 {args.save}")
+    
+    shutil.rmtree(workdir, ignore_errors=True)
+    regressed = any(
+        baseline.get(key) and summary[key] / baseline[key] > REGRESSION_RATIO for key in summary
+    )
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
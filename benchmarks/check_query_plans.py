@@ -0,0 +1,53 @@
+"""
+热点查询执行计划检查
+确认日记列表、近30天字数趋势、心情分布三条查询都走索引，
+没有全表扫描，也没有临时 B 树排序
+
+运行方式：
+python benchmarks/check_query_plans.py                 # 使用临时示例库
+python benchmarks/check_query_plans.py mydiary.db ...  # 检查（并迁移）已有的库
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import DatabaseManager
+
+
+def check(db_path: str) -> bool:
+    """检查一个数据库，返回是否全部通过"""
+    db = DatabaseManager(db_path)
+    print(f"📂 {db_path} (schema v{db.SCHEMA_VERSION})")
+    
+    passed = True
+    for name, problems in db.check_query_plans().items():
+        if problems:
+            passed = False
+            print(f"  ❌ {name}: {'; '.join(problems)}")
+        else:
+            print(f"  ✅ {name}")
+    
+    db.close()
+    return passed
+
+
+def main():
+    """主函数"""
+    paths = sys.argv[1:]
+    
+    if not paths:
+        sample_path = os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+        db = DatabaseManager(sample_path)
+        moods = ['happy', 'sad', 'neutral', 'anxious']
+        for i in range(200):
+            db.add_diary(f"示例日记 {i}", f"<p>第 {i} 篇</p>", moods[i % len(moods)], i % 5 == 0)
+        db.close()
+        paths = [sample_path]
+    
+    results = [check(path) for path in paths]
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+合成日记语料生成器
+按固定随机种子生成中英文混排的富文本日记，同一组参数每次生成的内容完全相同，
+用于基准测试和大数据量下的手工测试
+
+分布（大致模拟一个人多年的日记）：
+- 语言：约 70% 中文、15% 英文、15% 中英混排
+- 心情：开心、平静居多，愤怒、困惑较少
+- 重要：约 8% 标记为重要
+- 日期：越近越密集（指数分布），最早不超过 10 年前
+- 篇幅：对数正态分布，多数几百字，少数几千字
+
+运行方式：
+python benchmarks/corpus.py 10000 mydiary_10k.db   # 生成一个测试库
+"""
+
+import sys
+import os
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+MOOD_WEIGHTS = [
+    ('happy', 30),
+    ('neutral', 25),
+    ('satisfied', 12),
+    ('tired', 10),
+    ('sad', 8),
+    ('anxious', 7),
+    ('confused', 5),
+    ('angry', 3),
+]
+
+IMPORTANT_RATE = 0.08
+
+# 日期分布：平均距今 1 年，最多 10 年
+MEAN_AGE_DAYS = 365
+MAX_AGE_DAYS = 3650
+
+DEFAULT_END_DATE = date(2025, 1, 1)
+
+CN_SUBJECTS = ['今天', '早上', '下午', '晚上', '周末', '我', '我们', '朋友', '妈妈', '同事', '老师', '室友']
+CN_VERBS = ['去了', '看了', '想起', '讨论了', '完成了', '准备', '计划', '写完了', '整理了', '遇到了', '听说了', '学习了']
+CN_OBJECTS = [
+    '图书馆', '一部电影', '期末考试', '项目报告', '新开的咖啡馆', '小时候的事情', '明年的旅行',
+    '数据库课程', '公园里的樱花', '一本小说', '实习面试', '家里的猫', '毕业论文', '周末的聚会',
+    '跑步计划', '晚饭的菜单', '老家的院子', '第一场雪',
+]
+CN_TAILS = ['，感觉很充实。', '，有点累。', '，心情不错。', '，还需要继续努力。', '。', '，希望明天会更好。', '，收获很多。']
+CN_TITLES = ['随笔', '日常', '周记', '读书笔记', '旅行', '工作', '学习', '心情', '计划', '回忆']
+
+EN_WORDS = (
+    'the a today morning evening weekend friend meeting project coffee library movie book '
+    'train rain sunshine walk dinner lunch exam code database garden music concert trip '
+    'quiet busy tired happy long short new old finally almost really still again'
+).split()
+EN_TITLES = ['Notes', 'Daily log', 'Weekend', 'Reading', 'Travel', 'Work', 'Ideas', 'Thoughts']
+
+HTML_HEAD = (
+    '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+    '<html><head><meta name="qrichtext" content="1" /><meta charset="utf-8" /><style type="text/css">\n'
+    'p, li { white-space: pre-wrap; }\n'
+    'hr { height: 1px; border-width: 0; }\n'
+    'li.unchecked::marker { content: "\\2610"; }\n'
+    'li.checked::marker { content: "\\2612"; }\n'
+    '</style></head><body style=" font-family:\'.AppleSystemUIFont\'; font-size:13pt; '
+    'font-weight:400; font-style:normal;">\n'
+)
+HTML_PARAGRAPH = (
+    '<p style=" margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; '
+    '-qt-block-indent:0; text-indent:0px;">{}</p>'
+)
+HTML_EMPHASIS = [
+    '<span style=" font-weight:700;">{}</span>',
+    '<span style=" font-style:italic;">{}</span>',
+    '<span style=" color:#e74c3c;">{}</span>',
+]
+HTML_TAIL = '</body></html>'
+
+
+def _escape(text: str) -> str:
+    """转义 HTML 特殊字符"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _cn_sentence(rng: random.Random) -> str:
+    """生成一句中文"""
+    return rng.choice(CN_SUBJECTS) + rng.choice(CN_VERBS) + rng.choice(CN_OBJECTS) + rng.choice(CN_TAILS)
+
+
+def _en_sentence(rng: random.Random) -> str:
+    """生成一句英文"""
+    words = [rng.choice(EN_WORDS) for _ in range(rng.randint(5, 14))]
+    return ' '.join(words).capitalize() + '. '
+
+
+def _paragraph(rng: random.Random, language: str, sentences: int) -> str:
+    """生成一个 Qt 富文本段落，偶尔带加粗/斜体/颜色"""
+    parts = []
+    for _ in range(sentences):
+        if language == 'cn' or (language == 'mixed' and rng.random() < 0.6):
+            sentence = _escape(_cn_sentence(rng))
+        else:
+            sentence = _escape(_en_sentence(rng))
+        if rng.random() < 0.05:
+            sentence = rng.choice(HTML_EMPHASIS).format(sentence)
+        parts.append(sentence)
+    return HTML_PARAGRAPH.format(''.join(parts))
+
+
+def generate_diary(rng: random.Random, end_date: date = DEFAULT_END_DATE) -> Dict:
+    """用给定的随机数生成器生成一篇日记，返回 add_diaries 需要的字典"""
+    roll = rng.random()
+    language = 'cn' if roll < 0.70 else 'en' if roll < 0.85 else 'mixed'
+    
+    if language == 'en':
+        title = f"{rng.choice(EN_TITLES)} #{rng.randint(1, 999)}"
+    else:
+        title = f"{rng.choice(CN_TITLES)}：{rng.choice(CN_OBJECTS)}"
+    
+    # 句子数服从对数正态分布，中位数约 8 句
+    sentences = max(1, min(400, int(rng.lognormvariate(2.1, 0.8))))
+    paragraphs = []
+    while sentences > 0:
+        size = min(sentences, rng.randint(2, 6))
+        paragraphs.append(_paragraph(rng, language, size))
+        sentences -= size
+    
+    age = min(MAX_AGE_DAYS, int(rng.expovariate(1 / MEAN_AGE_DAYS)))
+    created = end_date - timedelta(days=age)
+    modified = datetime.combine(created, datetime.min.time()) + timedelta(seconds=rng.randint(6 * 3600, 86399))
+    
+    return {
+        'title': title,
+        'content': HTML_HEAD + '\n'.join(paragraphs) + HTML_TAIL,
+        'mood': rng.choices([m for m, _ in MOOD_WEIGHTS], weights=[w for _, w in MOOD_WEIGHTS])[0],
+        'is_important': rng.random() < IMPORTANT_RATE,
+        'created_date': created,
+        'modified_date': modified,
+    }
+
+
+def generate_diaries(count: int, seed: int = 42, end_date: Optional[date] = None) -> Iterator[Dict]:
+    """
+    逐条生成 count 篇日记（生成器，不占用大量内存）
+    
+    Args:
+        count: 篇数
+        seed: 随机种子，相同种子和参数生成的语料完全一致
+        end_date: 最新一篇日记的日期，默认固定为 DEFAULT_END_DATE；
+                  基准测试传入今天，近 30 天趋势才有数据
+    """
+    rng = random.Random(seed)
+    end_date = end_date or DEFAULT_END_DATE
+    for _ in range(count):
+        yield generate_diary(rng, end_date)
+
+
+def sample_keywords(count: int, seed: int = 42) -> list:
+    """从语料词表中抽取搜索关键词（中文词、英文词、短语混合）"""
+    rng = random.Random(seed)
+    pool = CN_OBJECTS + CN_VERBS + EN_WORDS + [f'"{w}"' for w in CN_OBJECTS[:5]]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def sample_typos(count: int, seed: int = 42) -> list:
+    """抽取关键词并随机删掉、替换或对调其中一个字，模拟输入错误（用于模糊搜索）"""
+    rng = random.Random(seed)
+    typos = []
+    for word in sample_keywords(count, seed):
+        word = word.strip('"')
+        i = rng.randrange(len(word))
+        edit = rng.choice(('drop', 'replace', 'swap')) if len(word) > 2 else 'replace'
+        if edit == 'drop':
+            word = word[:i] + word[i + 1:]
+        elif edit == 'replace':
+            word = word[:i] + rng.choice('的了和是在有xyzq') + word[i + 1:]
+        else:
+            i = min(i, len(word) - 2)
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        typos.append(word)
+    return typos
+
+
+def main():
+    """生成一个测试数据库"""
+    if len(sys.argv) < 3:
+        print("用法: python benchmarks/corpus.py <篇数> <数据库路径> [随机种子]")
+        sys.exit(1)
+    
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from main import DatabaseManager
+    
+    count = int(sys.argv[1])
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 42
+    db = DatabaseManager(sys.argv[2])
+    
+    def progress(done, rate):
+        print(f"\r  已写入 {done}/{count} 篇 ({rate:.0f} 篇/秒)", end='', flush=True)
+    
+    db.add_diaries(generate_diaries(count, seed, date.today()), progress=progress)
+    print()
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
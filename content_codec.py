@@ -0,0 +1,64 @@
+"""
+日记正文的压缩存储格式
+main.py 写入的正文是 1 字节版本号 + 用预置字典压缩的 raw deflate 数据（BLOB），
+旧版本和第一节课的程序写入的是 HTML 文本（TEXT）。读取同一个数据库的程序都用 decode_content 解码，
+两种格式都能读。
+"""
+
+import zlib
+
+# QTextEdit.toHtml() 的输出里大部分字节是每篇都一样的 DOCTYPE/meta/style 模板，
+# 用预置字典压缩后只需存储正文本身。字典一旦发布就不能再改，要换字典请新增版本号，
+# 并同步到 lesson1/database.py 里的解码副本。
+_CONTENT_ZDICT_V1 = (
+    '<p align="center" style=" margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; '
+    '-qt-block-indent:0; text-indent:0px;"><p align="right" style=" margin-top:12px; margin-bottom:12px; '
+    '<span style=" font-family:\'Arial\'; font-size:18pt; font-weight:700; font-style:italic; '
+    'text-decoration: underline; color:#e74c3c; background-color:#ffff00;"></span>'
+    '<span style=" font-size:14pt;"><span style=" font-weight:700;"><span style=" color:#'
+    '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+    '<html><head><meta name="qrichtext" content="1" /><style type="text/css">\n'
+    'p, li { white-space: pre-wrap; }\n</style></head>'
+    '<html><head><meta name="qrichtext" content="1" /><meta charset="utf-8" /><style type="text/css">\n'
+    'p, li { white-space: pre-wrap; }\n'
+    'hr { height: 1px; border-width: 0; }\n'
+    'li.unchecked::marker { content: "\\2610"; }\n'
+    'li.checked::marker { content: "\\2612"; }\n'
+    '</style></head><body style=" font-family:\'.AppleSystemUIFont\'; font-size:13pt; '
+    'font-weight:400; font-style:normal;">\n'
+    '<p style="-qt-paragraph-type:empty; margin-top:0px; margin-bottom:0px; margin-left:0px; '
+    'margin-right:0px; -qt-block-indent:0; text-indent:0px;"><br /></p>'
+    '</span></p></body></html>\n'
+    '<p style=" margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; '
+    '-qt-block-indent:0; text-indent:0px;">'
+).encode('utf-8')
+
+# 版本号 -> 预置字典；存储格式为 1 字节版本号 + raw deflate 数据
+_CONTENT_ZDICTS = {1: _CONTENT_ZDICT_V1}
+CONTENT_FORMAT_VERSION = 1
+
+
+def encode_content(content: str):
+    """
+    压缩正文，返回写入数据库的值
+    
+    压缩后不比原文小时（很短的纯文本）直接存 TEXT。
+    """
+    raw = content.encode('utf-8')
+    compressor = zlib.compressobj(
+        9, zlib.DEFLATED, -15, zdict=_CONTENT_ZDICTS[CONTENT_FORMAT_VERSION]
+    )
+    packed = bytes([CONTENT_FORMAT_VERSION]) + compressor.compress(raw) + compressor.flush()
+    return packed if len(packed) < len(raw) else content
+
+
+def decode_content(value) -> str:
+    """解压数据库中的正文，旧版本存的 TEXT 原样返回"""
+    if value is None or isinstance(value, str):
+        return value
+    
+    version = value[0]
+    if version not in _CONTENT_ZDICTS:
+        raise ValueError(f"未知的正文压缩格式版本: {version}")
+    decompressor = zlib.decompressobj(-15, zdict=_CONTENT_ZDICTS[version])
+    return (decompressor.decompress(value[1:]) + decompressor.flush()).decode('utf-8')
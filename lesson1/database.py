@@ -4,26 +4,131 @@
 """
 
 import sqlite3
+import threading
+import zlib
 from datetime import datetime
 from typing import List, Dict, Optional
 
+# 完整版 main.py 会把正文压缩存储（格式见项目根目录 content_codec.py）。
+# 第一节课的程序要能单独运行、也能单独拷走，所以这里放一份只读的解码副本，不从上级目录导入；
+# 预置字典发布后不会再改，新增版本时把新字典也抄到这里。
+_CONTENT_ZDICT_V1 = (
+    '<p align="center" style=" margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; '
+    '-qt-block-indent:0; text-indent:0px;"><p align="right" style=" margin-top:12px; margin-bottom:12px; '
+    '<span style=" font-family:\'Arial\'; font-size:18pt; font-weight:700; font-style:italic; '
+    'text-decoration: underline; color:#e74c3c; background-color:#ffff00;"></span>'
+    '<span style=" font-size:14pt;"><span style=" font-weight:700;"><span style=" color:#'
+    '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+    '<html><head><meta name="qrichtext" content="1" /><style type="text/css">\n'
+    'p, li { white-space: pre-wrap; }\n</style></head>'
+    '<html><head><meta name="qrichtext" content="1" /><meta charset="utf-8" /><style type="text/css">\n'
+    'p, li { white-space: pre-wrap; }\n'
+    'hr { height: 1px; border-width: 0; }\n'
+    'li.unchecked::marker { content: "\\2610"; }\n'
+    'li.checked::marker { content: "\\2612"; }\n'
+    '</style></head><body style=" font-family:\'.AppleSystemUIFont\'; font-size:13pt; '
+    'font-weight:400; font-style:normal;">\n'
+    '<p style="-qt-paragraph-type:empty; margin-top:0px; margin-bottom:0px; margin-left:0px; '
+    'margin-right:0px; -qt-block-indent:0; text-indent:0px;"><br /></p>'
+    '</span></p></body></html>\n'
+    '<p style=" margin-top:0px; margin-bottom:0px; margin-left:0px; margin-right:0px; '
+    '-qt-block-indent:0; text-indent:0px;">'
+).encode('utf-8')
+
+_CONTENT_ZDICTS = {1: _CONTENT_ZDICT_V1}
+
+
+def decode_content(value) -> str:
+    """解压数据库中的正文，旧版本存的 TEXT 原样返回"""
+    if value is None or isinstance(value, str):
+        return value
+    
+    version = value[0]
+    if version not in _CONTENT_ZDICTS:
+        raise ValueError(f"未知的正文压缩格式版本: {version}")
+    decompressor = zlib.decompressobj(-15, zdict=_CONTENT_ZDICTS[version])
+    return (decompressor.decompress(value[1:]) + decompressor.flush()).decode('utf-8')
+
 
 class DatabaseManager:
     """数据库管理器"""
     
-    def __init__(self, db_path: str = "mydiary.db"):
+    def __init__(self, db_path: str = "mydiary.db", journal_mode: str = 'WAL',
+                 synchronous: str = 'NORMAL', cache_size: int = -16000,
+                 mmap_size: int = 64 * 1024 * 1024, profiler=None):
         """
         初始化数据库管理器
         
         Args:
             db_path: 数据库文件路径
+            journal_mode: 日志模式，WAL 模式下读写互不阻塞
+            synchronous: 同步级别，WAL 模式下 NORMAL 已足够安全
+            cache_size: 页缓存大小，负数表示单位为 KiB
+            mmap_size: 内存映射读取的字节数，0 表示关闭
+            profiler: 可选的 QueryProfiler（见项目根目录 query_profiler.py），
+                      传入后每条 SQL 的耗时都会被记录
         """
         self.db_path = db_path
+        self.pragmas = {
+            'journal_mode': journal_mode,
+            'synchronous': synchronous,
+            'cache_size': cache_size,
+            'mmap_size': mmap_size,
+        }
+        # 每个线程保存一条长连接，不必每次操作都重新连接
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.profiler = profiler
         self.init_database()
     
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        获取当前线程的数据库连接
+        
+        第一次调用时创建连接并设置 PRAGMA，之后直接复用。
+        
+        Returns:
+            当前线程专属的 sqlite3 连接
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.generation == self._generation:
+            return conn
+        
+        if self.profiler is not None:
+            conn = self.profiler.connect(self.db_path, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # 使用Row工厂，返回字典
+        # 在 SQL 里解压正文，搜索时才能匹配压缩存储的日记
+        conn.create_function('decode_content', 1, decode_content, deterministic=True)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        
+        with self._lock:
+            self._connections.append(conn)
+        self._local.conn = conn
+        self._local.generation = self._generation
+        return conn
+    
+    def close(self):
+        """关闭所有连接，程序退出前调用"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        
+        for conn in connections:
+            try:
+                conn.execute('PRAGMA optimize')
+                conn.close()
+            except sqlite3.Error:
+                pass
+        print(f"👋 数据库连接已关闭: {self.db_path}")
+    
     def init_database(self):
         """初始化数据库，创建表结构"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # 创建日记表
@@ -40,7 +145,6 @@ class DatabaseManager:
         ''')
         
         conn.commit()
-        conn.close()
         print(f"✅ 数据库初始化完成: {self.db_path}")
     
     def add_diary(self, title: str, content: str, mood: str = 'neutral') -> int:
@@ -55,7 +159,7 @@ class DatabaseManager:
         Returns:
             新添加日记的ID
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         now = datetime.now()
@@ -68,7 +172,6 @@ class DatabaseManager:
         
         conn.commit()
         diary_id = cursor.lastrowid
-        conn.close()
         
         print(f"✅ 日记已保存，ID: {diary_id}")
         return diary_id
@@ -80,9 +183,7 @@ class DatabaseManager:
         Returns:
             日记列表，每条包含 id, title, created_date, mood
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # 使用Row工厂，返回字典
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute('''
             SELECT id, title, created_date, mood
@@ -91,7 +192,6 @@ class DatabaseManager:
         ''')
         
         rows = cursor.fetchall()
-        conn.close()
         
         # 转换为字典列表
         diaries = [dict(row) for row in rows]
@@ -108,9 +208,7 @@ class DatabaseManager:
         Returns:
             日记详情字典，如果不存在返回None
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         cursor.execute('''
             SELECT id, title, content, mood, created_date, modified_date, word_count
@@ -119,10 +217,10 @@ class DatabaseManager:
         ''', (diary_id,))
         
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             diary = dict(row)
+            diary['content'] = decode_content(diary['content'])
             print(f"📖 读取日记: {diary['title']}")
             return diary
         else:
@@ -142,7 +240,7 @@ class DatabaseManager:
         Returns:
             是否更新成功
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         now = datetime.now()
@@ -156,7 +254,6 @@ class DatabaseManager:
         
         conn.commit()
         affected = cursor.rowcount
-        conn.close()
         
         if affected > 0:
             print(f"✅ 日记已更新，ID: {diary_id}")
@@ -175,14 +272,13 @@ class DatabaseManager:
         Returns:
             是否删除成功
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM diaries WHERE id = ?', (diary_id,))
         
         conn.commit()
         affected = cursor.rowcount
-        conn.close()
         
         if affected > 0:
             print(f"✅ 日记已删除，ID: {diary_id}")
@@ -201,20 +297,17 @@ class DatabaseManager:
         Returns:
             匹配的日记列表
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         search_term = f"%{keyword}%"
         cursor.execute('''
             SELECT id, title, created_date, mood
             FROM diaries
-            WHERE title LIKE ? OR content LIKE ?
+            WHERE title LIKE ? OR decode_content(content) LIKE ?
             ORDER BY created_date DESC
         ''', (search_term, search_term))
         
         rows = cursor.fetchall()
-        conn.close()
         
         diaries = [dict(row) for row in rows]
         print(f"🔍 搜索 '{keyword}' 找到 {len(diaries)} 条结果")
@@ -227,7 +320,7 @@ class DatabaseManager:
         Returns:
             统计数据字典
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # 总日记数
@@ -241,8 +334,6 @@ class DatabaseManager:
         # 平均字数
         avg_words = total_words // total_count if total_count > 0 else 0
         
-        conn.close()
-        
         stats = {
             'total_count': total_count,
             'total_words': total_words,
@@ -299,4 +390,5 @@ if __name__ == '__main__':
     print("\n7. 删除日记")
     db.delete_diary(id2)
     
+    db.close()
     print("\n=== 测试完成 ===")
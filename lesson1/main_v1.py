@@ -318,6 +318,11 @@ class MyDiaryApp(QMainWindow):
             f"{stats['total_words']} 字 "
             f"(平均 {stats['avg_words']} 字/篇)"
         )
+    
+    def closeEvent(self, event):
+        """关闭窗口时释放数据库连接"""
+        self.db.close()
+        super().closeEvent(event)
 
 
 def main():
@@ -0,0 +1,283 @@
+"""
+SQL 查询计时与慢查询日志
+给 sqlite3 连接包一层：记录每条语句的指纹、耗时、行数和耗时分布，
+超过阈值的语句连同 EXPLAIN QUERY PLAN 写入滚动日志文件
+
+默认不启用；把 QueryProfiler 传给 DatabaseManager 后，新建的连接才会计时：
+
+    profiler = QueryProfiler(slow_ms=50, log_path='slow_queries.log')
+    db = DatabaseManager('mydiary.db', profiler=profiler)
+    ...
+    print(profiler.report())
+"""
+
+import re
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional
+
+# 耗时分布的桶上界（毫秒），最后一个桶收集更慢的语句
+HISTOGRAM_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+# 只有这些语句能做 EXPLAIN QUERY PLAN
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+_FINGERPRINT_RULES = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                  # 字符串字面量
+    (re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b'), '?'),     # 数字字面量
+    (re.compile(r'\b(IN|VALUES)\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE), r'\1 (?, ...)'),  # IN (?, ?, ?) 列表
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def fingerprint(sql: str) -> str:
+    """把语句归一化为指纹：去掉字面量和多余空白，参数个数不同的 IN 列表视为同一条"""
+    for pattern, replacement in _FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryProfiler:
+    """按语句指纹汇总耗时，记录慢查询（线程安全）"""
+    
+    def __init__(self, slow_ms: float = 100.0, log_path: Optional[str] = None,
+                 max_bytes: int = 1024 * 1024, backup_count: int = 3):
+        """
+        Args:
+            slow_ms: 慢查询阈值（毫秒），执行加取数总耗时达到阈值的语句写入日志
+            log_path: 慢查询日志文件，None 表示只统计不写文件
+            max_bytes: 单个日志文件的大小上限，超过后滚动
+            backup_count: 保留的旧日志文件个数
+        """
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self.stats: Dict[str, Dict] = {}
+        self.slow_count = 0
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        
+        self._logger = None
+        if log_path:
+            from logging.handlers import RotatingFileHandler  # 导入较慢，只在需要写日志时导入
+            self._logger = logging.Logger('mydiary.slow_sql')
+            handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self._logger.addHandler(handler)
+    
+    def connect(self, database: str, **kwargs) -> sqlite3.Connection:
+        """创建一条会被计时的连接，参数同 sqlite3.connect"""
+        conn = sqlite3.connect(database, factory=ProfiledConnection, **kwargs)
+        conn.profiler = self
+        return conn
+    
+    def _fingerprint(self, sql: str) -> str:
+        fp = self._fingerprints.get(sql)
+        if fp is None:
+            fp = fingerprint(sql)
+            if len(self._fingerprints) < 10000:
+                self._fingerprints[sql] = fp
+        return fp
+    
+    def record(self, conn: sqlite3.Connection, sql: str, params, seconds: float, rows: int):
+        """记录一条语句（由 ProfiledCursor 在语句结束时调用）"""
+        fp = self._fingerprint(sql)
+        ms = seconds * 1000
+        bucket = next(i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if ms <= bound)
+        
+        with self._lock:
+            entry = self.stats.get(fp)
+            if entry is None:
+                entry = self.stats[fp] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+                    'histogram': [0] * len(HISTOGRAM_BOUNDS_MS),
+                }
+            entry['count'] += 1
+            entry['total_ms'] += ms
+            entry['max_ms'] = max(entry['max_ms'], ms)
+            entry['rows'] += rows
+            entry['histogram'][bucket] += 1
+            slow = ms >= self.slow_ms
+            if slow:
+                self.slow_count += 1
+        
+        logger = self._logger
+        if slow and logger is not None:
+            self._log_slow(logger, conn, sql, params, ms, rows)
+    
+    def _log_slow(self, logger: logging.Logger, conn: sqlite3.Connection, sql: str, params, ms: float, rows: int):
+        """把慢查询和它的执行计划写入日志"""
+        lines = [
+            f"慢查询 {ms:.1f} ms, {rows} 行, 线程 {threading.current_thread().name}",
+            f"  SQL: {' '.join(sql.split())}",
+        ]
+        if params is not None:
+            text = repr(params)
+            lines.append(f"  参数: {text[:200] + '...' if len(text) > 200 else text}")
+        
+        if params is None and '?' in sql:
+            lines.append("  执行计划: 无参数样本")
+        elif sql.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                # 直接调用基类方法，执行计划本身不计入统计
+                plan = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params or ()).fetchall()
+                lines.append("  执行计划:")
+                lines.extend([f"    {row[3]}" for row in plan] or ["    (无)"])
+            except sqlite3.Error as e:
+                lines.append(f"  执行计划获取失败: {e}")
+        
+        logger.warning('\n'.join(lines))
+    
+    @staticmethod
+    def _percentile(histogram: List[int], count: int, pct: float) -> float:
+        """由分布估算分位数，返回所在桶的上界"""
+        target = count * pct / 100
+        seen = 0
+        for bound, n in zip(HISTOGRAM_BOUNDS_MS, histogram):
+            seen += n
+            if seen >= target:
+                return bound
+        return HISTOGRAM_BOUNDS_MS[-1]
+    
+    def snapshot(self) -> List[Dict]:
+        """按总耗时从高到低返回每条语句的统计"""
+        with self._lock:
+            items = [(fp, dict(entry, histogram=list(entry['histogram']))) for fp, entry in self.stats.items()]
+        
+        result = []
+        for fp, entry in items:
+            entry['sql'] = fp
+            entry['avg_ms'] = entry['total_ms'] / entry['count']
+            entry['p50_ms'] = self._percentile(entry['histogram'], entry['count'], 50)
+            entry['p95_ms'] = self._percentile(entry['histogram'], entry['count'], 95)
+            result.append(entry)
+        result.sort(key=lambda e: e['total_ms'], reverse=True)
+        return result
+    
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self.stats.clear()
+            self.slow_count = 0
+    
+    def report(self, limit: int = 20) -> str:
+        """生成文本报表（总耗时最高的 limit 条）"""
+        lines = [f"{'次数':>7} {'总计ms':>10} {'平均ms':>9} {'p95≤ms':>8} {'最大ms':>9} {'行数':>8}  语句"]
+        for e in self.snapshot()[:limit]:
+            lines.append(
+                f"{e['count']:>7} {e['total_ms']:>10.1f} {e['avg_ms']:>9.3f} {e['p95_ms']:>8g} "
+                f"{e['max_ms']:>9.2f} {e['rows']:>8}  {e['sql'][:120]}"
+            )
+        return '\n'.join(lines)
+    
+    def close(self):
+        """关闭日志文件（之后仍会统计，只是不再写日志）"""
+        logger, self._logger = self._logger, None
+        if logger is not None:
+            for handler in list(logger.handlers):
+                handler.close()
+                logger.removeHandler(handler)
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    计时游标
+    
+    查询语句的耗时包括 execute 和之后的取数，直到结果取完、游标关闭、
+    执行下一条语句或游标被回收时才记录；其他语句执行完立即记录。
+    """
+    
+    _pending = None  # [sql, 参数, 已用秒数, 已取行数]
+    
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._pending = [sql, parameters, time.perf_counter() - start, 0]
+        if self.description is None:
+            self._pending[3] = max(self.rowcount, 0)
+            self._finish()
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            # 慢查询日志用第一组参数做执行计划
+            sample = seq_of_parameters[0] if isinstance(seq_of_parameters, (list, tuple)) and seq_of_parameters else None
+            self._pending = [sql, sample, time.perf_counter() - start, max(self.rowcount, 0)]
+            self._finish()
+        return self
+    
+    def _fetched(self, seconds: float, rows: int, exhausted: bool):
+        pending = self._pending
+        if pending is not None:
+            pending[2] += seconds
+            pending[3] += rows
+            if exhausted:
+                self._finish()
+    
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            sql, params, seconds, rows = pending
+            self.connection.profiler.record(self.connection, sql, params, seconds, rows)
+    
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - start, row is not None, row is None)
+        return row
+    
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(time.perf_counter() - start, len(rows), len(rows) < size)
+        return rows
+    
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - start, len(rows), True)
+        return rows
+    
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - start, 0, True)
+            raise
+        self._fetched(time.perf_counter() - start, 1, False)
+        return row
+    
+    def close(self):
+        self._finish()
+        super().close()
+    
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """所有语句都经过 ProfiledCursor 的连接，由 QueryProfiler.connect 创建"""
+    
+    profiler: QueryProfiler = None
+    
+    def cursor(self, factory=None):
+        return super().cursor(factory or ProfiledCursor)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
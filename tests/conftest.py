@@ -0,0 +1,47 @@
+"""
+测试公用的 fixture 和检查函数
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+from main import DatabaseManager
+from corpus import generate_diaries
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """Qt 应用对象（没有显示器时用 offscreen 平台）"""
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def db(tmp_path):
+    """临时目录里的空数据库"""
+    manager = DatabaseManager(str(tmp_path / 'diary.db'))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def add(db):
+    """add(标题, 正文, ...) 写入一篇日记并返回 id"""
+    def add_diary(title, content, mood='neutral', is_important=False):
+        return db.add_diary(title, content, mood, is_important)
+    return add_diary
+
+
+@pytest.fixture
+def corpus_db(db):
+    """写入 300 篇合成日记（日期、心情、字数都有大量重复值）"""
+    db.add_diaries(generate_diaries(300, seed=7, end_date=date.today()))
+    return db
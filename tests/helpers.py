@@ -0,0 +1,32 @@
+"""
+测试用的检查函数
+"""
+
+import time
+
+from main import DatabaseManager
+
+
+def wait_until(qapp, predicate, timeout: float = 5.0):
+    """处理 Qt 事件直到 predicate() 为真（后台请求的回调排队在 GUI 线程里）"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, '等待超时'
+        qapp.processEvents()
+        time.sleep(0.002)
+
+
+def assert_stats_consistent(db: DatabaseManager):
+    """触发器维护的汇总表和直接聚合 diaries 的结果一致"""
+    conn = db.get_connection()
+    assert tuple(conn.execute('SELECT diary_count, total_words FROM diary_stats_total').fetchone()) == \
+        tuple(conn.execute('SELECT COUNT(*), COALESCE(SUM(word_count), 0) FROM diaries').fetchone())
+    assert [tuple(row) for row in conn.execute('SELECT * FROM diary_stats_daily ORDER BY created_date')] == \
+        [tuple(row) for row in conn.execute('''
+            SELECT created_date, COUNT(*), COALESCE(SUM(word_count), 0)
+            FROM diaries GROUP BY created_date ORDER BY created_date
+        ''')]
+    assert [tuple(row) for row in conn.execute('SELECT * FROM diary_stats_mood ORDER BY mood')] == \
+        [tuple(row) for row in conn.execute('''
+            SELECT mood, COUNT(*) FROM diaries WHERE mood IS NOT NULL GROUP BY mood ORDER BY mood
+        ''')]
@@ -0,0 +1,36 @@
+"""
+DatabaseBridge：后台请求的结果和错误回到 GUI 线程
+"""
+
+import pytest
+
+from main import DatabaseBridge
+from tests.helpers import wait_until
+
+
+@pytest.fixture
+def bridge(qapp, db):
+    return DatabaseBridge(db)
+
+
+def test_results_and_errors_reach_callbacks(qapp, bridge, add):
+    diary_id = add('标题', '<p>正文</p>')
+    results = []
+    errors = []
+    failed = []
+    bridge.failed.connect(failed.append)
+    bridge.call('get_diary', diary_id, on_result=results.append)
+    bridge.call('run_saved_search', 12345, on_error=errors.append)
+    wait_until(qapp, lambda: results and errors)
+    assert results[0]['title'] == '标题'
+    assert isinstance(errors[0], KeyError)
+    assert failed == []
+
+
+def test_errors_without_handler_are_signalled(qapp, bridge):
+    failed = []
+    bridge.failed.connect(failed.append)
+    bridge.call('run_saved_search', 12345)
+    bridge.stream('iter_search', None)
+    wait_until(qapp, lambda: len(failed) == 2)
+    assert isinstance(failed[0], KeyError)
@@ -0,0 +1,42 @@
+"""
+批量写入：add_diaries 返回的 id 和进度回调
+"""
+
+import sqlite3
+
+
+def make_records(count: int, prefix: str = '第'):
+    return ({'title': f'{prefix}{i}篇', 'content': f'<p>正文{i}</p>', 'mood': 'happy'} for i in range(count))
+
+
+def test_add_diaries_ids_match_records_in_order(db, add):
+    # 删掉最大的 id，AUTOINCREMENT 也不会重用它
+    add('旧的', '<p>一</p>')
+    db.delete_diary(add('删掉的', '<p>二</p>'))
+    
+    ids = db.add_diaries(make_records(25), chunk_size=10)
+    assert len(ids) == len(set(ids)) == 25
+    assert [db.get_diary(diary_id)['title'] for diary_id in ids] == [f'第{i}篇' for i in range(25)]
+    
+    # 其他连接在两次调用之间写入
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("INSERT INTO diaries (title, content, created_date) VALUES ('外部', '外部写入', date('now'))")
+    conn.commit()
+    conn.close()
+    more = db.add_diaries(make_records(3, '补'), chunk_size=2)
+    assert min(more) > max(ids) + 1
+    assert [db.get_diary(diary_id)['title'] for diary_id in more] == ['补0篇', '补1篇', '补2篇']
+    assert db.get_statistics()['total_count'] == 30
+
+
+def test_add_diaries_reports_progress_per_chunk(db):
+    calls = []
+    db.add_diaries(make_records(25), chunk_size=10, progress=lambda done, rate: calls.append((done, rate)))
+    assert [done for done, _ in calls] == [10, 20, 25]
+    assert all(rate > 0 for _, rate in calls)
+
+
+def test_add_diaries_with_nothing_to_write(db):
+    calls = []
+    assert db.add_diaries(iter(()), progress=lambda *args: calls.append(args)) == []
+    assert calls == []
@@ -0,0 +1,90 @@
+"""
+DiaryCache 和 get_diary 的缓存失效
+"""
+
+import sqlite3
+
+from main import DiaryCache
+
+
+def entry(text: str) -> dict:
+    return {'title': text}
+
+
+def test_evicts_least_recently_used_first():
+    size = DiaryCache.sizeof(entry('a'))
+    cache = DiaryCache(size * 2)
+    cache.put('a', entry('a'))
+    cache.put('b', entry('b'))
+    assert cache.get('a') == entry('a')  # a 变成最近使用
+    cache.put('c', entry('c'))
+    assert cache.get('b') is None
+    assert cache.get('a') == entry('a') and cache.get('c') == entry('c')
+    
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evictions']) == (2, size * 2, 1)
+    assert (stats['hits'], stats['misses']) == (3, 1)
+
+
+def test_byte_limit_and_replacement():
+    size = DiaryCache.sizeof(entry('a'))
+    cache = DiaryCache(size * 3)
+    cache.put('big', entry('a' * size * 3))  # 单条超过上限的不缓存
+    assert cache.get('big') is None
+    
+    for key in 'abc':
+        cache.put(key, entry(key))
+    cache.put('a', entry('x'))  # 替换不重复计算大小
+    assert cache.stats()['bytes'] == size * 3
+    cache.put('d', entry('d' * 10))  # 更大的条目挤掉两条最久未用的
+    assert [key for key in 'abcd' if cache.get(key) is not None] == ['a', 'd']
+    assert cache.stats()['evictions'] == 2
+    
+    cache.invalidate('a')
+    cache.invalidate('missing')
+    assert cache.stats()['bytes'] == DiaryCache.sizeof(entry('d' * 10))
+    cache.clear()
+    assert cache.stats()['entries'] == cache.stats()['bytes'] == 0
+    assert cache.stats()['evictions'] == 2
+
+
+def test_get_diary_returns_copies(db, add):
+    diary_id = add('标题', '<p>正文</p>')
+    diary = db.get_diary(diary_id)
+    diary['title'] = '改了返回值'
+    diary['content'] = ''
+    again = db.get_diary(diary_id)
+    assert again['title'] == '标题' and again['content'] == '<p>正文</p>'
+    assert db.cache_stats()['hits'] >= 1
+
+
+def test_writes_invalidate_cached_diaries(db, add):
+    first = add('一', '<p>一</p>')
+    second = add('二', '<p>二</p>')
+    for diary_id in (first, second):
+        db.get_diary(diary_id)
+    
+    db.update_diary(first, '一改', '<p>一改</p>', 'sad', True)
+    assert db.get_diary(first)['title'] == '一改'
+    assert db.get_diary(first)['is_important'] == 1
+    
+    db.update_diaries([{'id': second, 'title': '二改', 'content': '<p>二改</p>', 'mood': 'happy'}])
+    assert db.get_diary(second)['content'] == '<p>二改</p>'
+    
+    db.delete_diary(second)
+    assert db.get_diary(second) is None
+
+
+def test_writes_by_other_programs_invalidate_cache(db, add):
+    diary_id = add('标题', '<p>正文</p>')
+    db.get_diary(diary_id)
+    
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE diaries SET title = '外部改的', content = '外部正文' WHERE id = ?", (diary_id,))
+    conn.commit()
+    assert db.get_diary(diary_id)['title'] == '外部改的'
+    
+    conn.execute('DELETE FROM diaries WHERE id = ?', (diary_id,))
+    conn.commit()
+    conn.close()
+    assert db.get_diary(diary_id) is None
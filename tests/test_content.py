@@ -0,0 +1,73 @@
+"""
+正文压缩存储，以及第一节课的程序读取 main.py 写入的数据库
+"""
+
+import pytest
+
+import content_codec
+from content_codec import decode_content, encode_content
+from lesson1 import database as lesson1_database
+from lesson1.database import DatabaseManager as LessonDatabaseManager
+
+HTML = (
+    '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+    '<html><head><meta name="qrichtext" content="1" /><style type="text/css">\n'
+    'p, li { white-space: pre-wrap; }\n</style></head><body>'
+    '<p>今天学习了 PyQt6 的信号和槽</p></body></html>'
+)
+
+
+@pytest.mark.parametrize('content', [HTML, '短', '', 'plain text ' * 50])
+def test_encode_decode_round_trip(content):
+    assert decode_content(encode_content(content)) == content
+
+
+def test_encode_compresses_qt_html():
+    packed = encode_content(HTML)
+    assert isinstance(packed, bytes) and len(packed) < len(HTML.encode('utf-8')) // 2
+
+
+def test_decode_keeps_text_rows():
+    assert decode_content('<p>旧版本</p>') == '<p>旧版本</p>'
+    assert decode_content(None) is None
+
+
+def test_lesson1_decoder_matches_content_codec():
+    # 第一节课的程序带着自己的解码副本，预置字典必须和 content_codec 完全一致
+    assert lesson1_database._CONTENT_ZDICTS == content_codec._CONTENT_ZDICTS
+    for content in (HTML, '短', ''):
+        assert lesson1_database.decode_content(encode_content(content)) == content
+
+
+def test_lesson1_reads_compressed_rows(db):
+    diary_id = db.add_diary('学习', HTML)
+    assert isinstance(db.get_connection().execute('SELECT content FROM diaries').fetchone()[0], bytes)
+    
+    lesson = LessonDatabaseManager(db.db_path)
+    assert lesson.get_diary(diary_id)['content'] == HTML
+    assert [diary['id'] for diary in lesson.search_diaries('信号和槽')] == [diary_id]
+    
+    # 第一节课写入的 TEXT 正文，完整版照常读取和搜索
+    lesson.update_diary(diary_id, '学习', '改成了纯文本', 'happy')
+    lesson.close()
+    assert db.get_diary(diary_id)['content'] == '改成了纯文本'
+
+
+def test_main_reindexes_rows_updated_by_lesson1(db):
+    diary_id = db.add_diary('学习', HTML)
+    
+    lesson = LessonDatabaseManager(db.db_path)
+    lesson.update_diary(diary_id, '学习', '改成了纯文本', 'happy')
+    lesson.close()
+    
+    assert [diary['id'] for diary in db.search_diaries('纯文本')] == [diary_id]
+    assert db.search_diaries('信号和槽') == []
+    assert db.get_diary(diary_id)['plain_text'] == '改成了纯文本'
+    assert db.get_statistics()['total_words'] == len('改成了纯文本')
+
+
+def test_short_text_update_keeps_plain_text(db):
+    # 很短的正文压缩后不更短，以 TEXT 保存；纯文本没变时也不能留下空的 plain_text
+    diary_id = db.add_diary('短', '<b>短</b>')
+    db.update_diary(diary_id, '短', '<i>短</i>')
+    assert db.get_connection().execute('SELECT plain_text FROM diaries WHERE id = ?', (diary_id,)).fetchone()[0] == '短'
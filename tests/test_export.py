@@ -0,0 +1,29 @@
+"""
+导出：iter_export 一条语句逐批读取全部日记，不经过 get_diary 缓存
+"""
+
+import sqlite3
+
+
+def test_iter_export_reads_all_diaries_in_list_order(corpus_db):
+    db = corpus_db
+    diary_id = db.get_all_diaries()[0]['id']
+    db.get_diary(diary_id)
+    before = db.cache_stats()
+    
+    batches = list(db.iter_export(batch_size=64))
+    assert [len(batch) for batch in batches] == [64, 64, 64, 64, 44]
+    rows = [row for batch in batches for row in batch]
+    assert [row['id'] for row in rows] == [diary['id'] for diary in db.get_all_diaries()]
+    plain_text = dict(db.get_connection().execute('SELECT id, plain_text FROM diaries'))
+    assert all(row['plain_text'] == plain_text[row['id']] for row in rows)
+    assert db.cache_stats() == before
+
+
+def test_iter_export_fills_plain_text_written_by_other_programs(db, add):
+    add('本程序', '<p>正文</p>')
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("INSERT INTO diaries (title, content, created_date) VALUES ('外部', '<p>外部写入</p>', date('now'))")
+    conn.commit()
+    conn.close()
+    assert sorted(row['plain_text'] for batch in db.iter_export() for row in batch) == ['外部写入', '正文']
@@ -0,0 +1,65 @@
+"""
+模糊搜索：n-gram 生成、相似度和打错一个字的查询
+"""
+
+import pytest
+
+from main import fuzzy_grams, search_tokens
+
+WORDS = ['hello', 'garden', 'library', 'concert', 'computer']
+FILLER = 'we met at noon and walked home'
+
+
+@pytest.fixture
+def diaries(db):
+    """每篇日记有一个目标词，其余是相同的填充文字"""
+    ids = {word: db.add_diary('日常', f'{FILLER} {word} {FILLER}') for word in WORDS}
+    ids['听说'] = db.add_diary('日常', '我听说了这件事')
+    ids['比赛'] = db.add_diary('周末', '今天去看NBA比赛')
+    return ids
+
+
+def one_edit_typos(word: str) -> set:
+    """word 替换、多打、漏打一个字母的所有写法"""
+    typos = set()
+    for i in range(len(word) + 1):
+        typos.add(word[:i] + 'q' + word[i:])
+        if i < len(word):
+            typos.add(word[:i] + word[i + 1:])
+            typos.add(word[:i] + ('q' if word[i] != 'q' else 'x') + word[i + 1:])
+    return typos
+
+
+def test_fuzzy_grams_pad_word_boundaries():
+    assert fuzzy_grams(search_tokens('ab')) == {'$$a', '$ab', 'ab$'}
+    assert fuzzy_grams(search_tokens('Cat')) == {'$$c', '$ca', 'cat', 'at$'}
+    # 中日韩两字组不分先后，单字不参与
+    assert fuzzy_grams(search_tokens('听说')) == fuzzy_grams(search_tokens('说听'))
+    assert fuzzy_grams(search_tokens('说')) == set()
+
+
+@pytest.mark.parametrize('keyword, word', [
+    ('librery', 'library'),
+    ('cnocert', 'concert'),
+    ('说听了', '听说'),
+    ('比赛', '比赛'),
+])
+def test_typos_find_intended_diary(db, diaries, keyword, word):
+    found = [diary['id'] for diary in db.fuzzy_search(keyword)]
+    assert found and found[0] == diaries[word]
+
+
+@pytest.mark.parametrize('word', WORDS)
+def test_one_edit_typo_on_5_to_8_letter_words(db, diaries, word):
+    for typo in one_edit_typos(word):
+        found = [diary['id'] for diary in db.fuzzy_search(typo)]
+        assert found[:1] == [diaries[word]], typo
+
+
+def test_score_is_shared_over_union(db, diaries):
+    exact = db.fuzzy_search('library')[0]
+    typo = db.fuzzy_search('librery')[0]
+    assert exact['score'] == 1.0
+    # 8 个 n-gram 里共有 5 个：5 / (8 + 8 - 5)
+    assert typo['score'] == round(5 / 11, 3)
+    assert db.fuzzy_search('librery', threshold=0.5) == []
@@ -0,0 +1,144 @@
+"""
+DiaryListModel：分页加载和按变更通知增量更新
+"""
+
+import pytest
+
+from main import DatabaseBridge, DiaryListModel, DiaryQuery
+from tests.helpers import wait_until
+
+PAGE_SIZE = 50
+
+
+@pytest.fixture
+def model(qapp, corpus_db):
+    """加载了第一页的列表模型（默认排序：重要的在前，再按日期）"""
+    list_model = DiaryListModel(DatabaseBridge(corpus_db), page_size=PAGE_SIZE)
+    list_model.db_async.changed.connect(list_model.apply_change)
+    list_model.reload()
+    wait_until(qapp, lambda: not list_model.loading)
+    return list_model
+
+
+def assert_index_consistent(model):
+    """row_of 与 rows 一致，行数与 rowCount 一致"""
+    assert model.row_index == {diary['id']: i for i, diary in enumerate(model.rows)}
+    assert model.rowCount() == len(model.rows)
+
+
+def load_all(qapp, model):
+    """一直翻页到 canFetchMore 为假"""
+    while model.canFetchMore():
+        model.fetchMore()
+        wait_until(qapp, lambda: not model.loading)
+
+
+def expected_ids(db):
+    return [diary['id'] for diary in db.query_diaries(DiaryQuery(), limit=None)]
+
+
+def set_important(db, diary_id, is_important):
+    diary = db.get_diary(diary_id)
+    db.update_diary(diary_id, diary['title'], diary['content'], diary['mood'], is_important)
+
+
+def test_insert_goes_to_sorted_position(qapp, model, corpus_db):
+    assert model.rowCount() == PAGE_SIZE
+    diary_id = corpus_db.add_diary('新日记', '<p>正文</p>', 'happy', True)
+    
+    # 今天的重要日记，ID 最大，排在最前
+    assert model.row_of(diary_id) == 0
+    assert model.rowCount() == PAGE_SIZE + 1
+    assert_index_consistent(model)
+    
+    load_all(qapp, model)
+    assert [diary['id'] for diary in model.rows] == expected_ids(corpus_db)
+
+
+def test_update_moves_row(qapp, model, corpus_db):
+    diary_id = next(diary['id'] for diary in model.rows[1:] if not diary['is_important'])
+    moves = []
+    model.rowsMoved.connect(lambda *args: moves.append(args))
+    
+    set_important(corpus_db, diary_id, True)
+    
+    assert len(moves) == 1
+    assert model.rows[model.row_of(diary_id)]['is_important']
+    assert model.rowCount() == PAGE_SIZE
+    assert_index_consistent(model)
+    assert [diary['id'] for diary in model.rows] == expected_ids(corpus_db)[:PAGE_SIZE]
+
+
+def test_delete_removes_row(qapp, model, corpus_db):
+    diary_id = model.rows[10]['id']
+    next_id = model.rows[11]['id']
+    corpus_db.delete_diary(diary_id)
+    
+    assert model.row_of(diary_id) == -1
+    assert model.row_of(next_id) == 10
+    assert model.rowCount() == PAGE_SIZE - 1
+    assert_index_consistent(model)
+    
+    load_all(qapp, model)
+    assert [diary['id'] for diary in model.rows] == expected_ids(corpus_db)
+
+
+def test_rows_not_loaded_yet(qapp, model, corpus_db):
+    unloaded = expected_ids(corpus_db)[PAGE_SIZE:]
+    deleted, promoted = unloaded[-1], unloaded[-2]
+    assert model.row_of(deleted) == -1
+    
+    # 删除或修改还没加载的行不影响已加载的部分
+    corpus_db.delete_diary(deleted)
+    assert model.rowCount() == PAGE_SIZE
+    
+    # 改成重要后排进已加载的部分，插入进来
+    set_important(corpus_db, promoted, True)
+    assert model.row_of(promoted) >= 0
+    assert model.rowCount() == PAGE_SIZE + 1
+    assert_index_consistent(model)
+    
+    load_all(qapp, model)
+    assert not model.canFetchMore()
+    ids = [diary['id'] for diary in model.rows]
+    assert ids == expected_ids(corpus_db)
+    assert len(set(ids)) == len(ids)
+    assert_index_consistent(model)
+
+
+def test_changes_while_page_loading(qapp, model, corpus_db):
+    """读取下一页期间的变更等页到了再应用，翻完后和直接查询的结果一致"""
+    loaded = [diary['id'] for diary in model.rows]
+    model.fetchMore()
+    assert model.loading
+    
+    corpus_db.delete_diary(loaded[5])
+    set_important(corpus_db, loaded[-1], False)
+    set_important(corpus_db, expected_ids(corpus_db)[PAGE_SIZE + 10], True)
+    new_id = corpus_db.add_diary('新日记', '<p>正文</p>')
+    assert model.pending_changes
+    
+    wait_until(qapp, lambda: not model.loading)
+    assert not model.pending_changes
+    assert model.row_of(loaded[5]) == -1
+    assert_index_consistent(model)
+    
+    load_all(qapp, model)
+    ids = [diary['id'] for diary in model.rows]
+    assert ids == expected_ids(corpus_db)
+    assert new_id in model.row_index
+    assert_index_consistent(model)
+
+
+def test_fixed_results_only_update_existing_rows(qapp, model, corpus_db):
+    diaries = corpus_db.query_diaries(DiaryQuery(), limit=5)
+    model.set_rows([dict(diary) for diary in diaries])
+    assert_index_consistent(model)
+    
+    corpus_db.add_diary('新日记', '<p>正文</p>', 'happy', True)
+    assert model.rowCount() == 5
+    
+    corpus_db.delete_diary(diaries[0]['id'])
+    assert model.row_of(diaries[1]['id']) == 0
+    assert model.rowCount() == 4
+    assert_index_consistent(model)
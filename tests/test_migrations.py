@@ -0,0 +1,189 @@
+"""
+表结构迁移：从最初的库、第一节课的库和每个中间版本升级到当前版本
+"""
+
+import sqlite3
+
+import pytest
+
+from content_codec import decode_content
+from main import DatabaseManager, html_to_text
+from tests.helpers import assert_stats_consistent
+
+# 最初版本 main.py 建的表
+BASELINE_SCHEMA = '''
+    CREATE TABLE diaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        mood TEXT DEFAULT 'neutral',
+        is_important INTEGER DEFAULT 0,
+        created_date DATE NOT NULL,
+        modified_date DATETIME,
+        word_count INTEGER DEFAULT 0
+    )
+'''
+
+# 第一节课 lesson1/database.py 建的表，没有 is_important
+LESSON1_SCHEMA = '''
+    CREATE TABLE diaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        content TEXT NOT NULL,
+        mood TEXT DEFAULT 'neutral',
+        created_date DATE NOT NULL,
+        modified_date DATETIME,
+        word_count INTEGER DEFAULT 0
+    )
+'''
+
+HEAD = '<html><head><style type="text/css">p { white-space: pre-wrap; }</style></head><body>'
+
+# (标题, 正文, 心情, 日期, 搜索词)；旧程序的字数是整段 HTML 的长度
+ROWS = [
+    ('周末', HEAD + '<p>今天去看NBA比赛，很精彩</p></body></html>', 'happy', '2024-03-02', '比赛'),
+    ('计划', HEAD + '<p>写了2024年度计划</p></body></html>', 'neutral', '2024-03-02', '年度计划'),
+    ('Notes', HEAD + '<p>The library was quiet</p></body></html>', 'tired', '2024-03-05', 'library'),
+    ('图书馆', '纯文本的日记', None, '2024-03-06', '纯文本'),
+]
+
+
+def insert_rows(path: str, lesson1: bool = False):
+    """像旧程序一样直接写入（不带 plain_text 等新列）"""
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        'INSERT INTO diaries (title, content, mood, created_date, modified_date, word_count) VALUES (?, ?, ?, ?, ?, ?)',
+        [(title, content, mood, day, day + ' 12:00:00', len(content)) for title, content, mood, day, _ in ROWS]
+    )
+    if not lesson1:
+        conn.execute("UPDATE diaries SET is_important = 1 WHERE title = '计划'")
+    conn.commit()
+    conn.close()
+
+
+def create_old_db(path: str, schema: str, lesson1: bool = False):
+    conn = sqlite3.connect(path)
+    conn.execute(schema)
+    conn.commit()
+    conn.close()
+    insert_rows(path, lesson1)
+
+
+def assert_indexes_distinct(conn):
+    """diaries 上的索引各自以不同的列开头（以同一列开头的索引只留一个）"""
+    leading = [
+        conn.execute(f"PRAGMA index_info('{index['name']}')").fetchone()['name']
+        for index in conn.execute("PRAGMA index_list('diaries')")
+    ]
+    assert len(leading) == len(set(leading)), leading
+
+
+def assert_upgraded(path: str):
+    """升级后：版本号、纯文本、字数、汇总表和各种搜索都正确"""
+    db = DatabaseManager(path)
+    conn = db.get_connection()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == DatabaseManager.SCHEMA_VERSION
+    
+    rows = conn.execute('SELECT id, title, content, plain_text, word_count FROM diaries ORDER BY id').fetchall()
+    assert len(rows) == len(ROWS)
+    for row in rows:
+        plain_text = html_to_text(decode_content(row['content']))
+        assert row['plain_text'] == plain_text
+        assert row['word_count'] == DatabaseManager.count_words(plain_text)
+    assert_stats_consistent(db)
+    
+    for row, (_, _, _, _, keyword) in zip(rows, ROWS):
+        assert row['id'] in [diary['id'] for diary in db.search_diaries(keyword)], keyword
+        assert row['id'] in [diary['id'] for diary in db.regex_search(keyword)], keyword
+    assert [diary['title'] for diary in db.fuzzy_search('librery')] == ['Notes']
+    assert len(db.list_diaries(limit=10)) == len(ROWS)
+    assert len(db.load_title_index()) == len(ROWS)
+    assert_indexes_distinct(conn)
+    assert not any(db.check_query_plans().values())
+    
+    # 升级后的库照常写入
+    diary_id = db.add_diary('新的一天', '<p>升级以后写的</p>', 'happy', True)
+    assert [diary['id'] for diary in db.search_diaries('升级')] == [diary_id]
+    assert_stats_consistent(db)
+    db.close()
+
+
+def test_fresh_database_is_current(db):
+    conn = db.get_connection()
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == DatabaseManager.SCHEMA_VERSION
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    assert {'diaries', 'diaries_fts', 'diaries_grams', 'diary_stats_total', 'saved_searches',
+            'diaries_fts_ai', 'diary_stats_au', 'diary_version_ad', 'diaries_plain_text_au'} <= names
+    assert_indexes_distinct(conn)
+
+
+def test_upgrade_from_baseline_schema(tmp_path):
+    path = str(tmp_path / 'baseline.db')
+    create_old_db(path, BASELINE_SCHEMA)
+    assert_upgraded(path)
+
+
+def test_upgrade_from_lesson1_schema(tmp_path):
+    path = str(tmp_path / 'lesson1.db')
+    create_old_db(path, LESSON1_SCHEMA, lesson1=True)
+    assert_upgraded(path)
+    
+    conn = sqlite3.connect(path)
+    assert conn.execute('SELECT COUNT(*) FROM diaries WHERE is_important = 0').fetchone()[0] == len(ROWS)
+    conn.close()
+
+
+@pytest.mark.parametrize('version', range(1, DatabaseManager.SCHEMA_VERSION))
+def test_upgrade_from_every_version(tmp_path, version):
+    """先只迁移到 version，用旧程序的方式写入，再用当前版本打开"""
+    
+    class OldDatabaseManager(DatabaseManager):
+        SCHEMA_VERSION = version
+        
+        def _sync_search_index(self, conn, batch_size=1000):
+            pass  # 旧版本的索引由当前版本补齐
+    
+    path = str(tmp_path / f'v{version}.db')
+    OldDatabaseManager(path).close()
+    insert_rows(path)
+    assert_upgraded(path)
+
+
+def test_reopening_does_not_migrate_again(tmp_path):
+    path = str(tmp_path / 'diary.db')
+    db = DatabaseManager(path)
+    db.add_diary('标题', '<p>正文</p>')
+    version = db.data_version()
+    db.close()
+    
+    db = DatabaseManager(path)
+    assert db.data_version() == version
+    assert [diary['title'] for diary in db.search_diaries('正文')] == ['标题']
+    db.close()
+
+
+@pytest.mark.parametrize('version', range(6, DatabaseManager.SCHEMA_VERSION))
+def test_upgrade_keeps_built_search_indexes(tmp_path, version):
+    """已经建好的全文索引和 n-gram 索引升级时不清空重建"""
+    
+    class OldDatabaseManager(DatabaseManager):
+        SCHEMA_VERSION = version
+    
+    path = str(tmp_path / f'v{version}.db')
+    OldDatabaseManager(path).close()
+    insert_rows(path)
+    OldDatabaseManager(path).close()
+    
+    statements = []
+    
+    class TracedDatabaseManager(DatabaseManager):
+        def get_connection(self):
+            conn = super().get_connection()
+            conn.set_trace_callback(statements.append)
+            return conn
+    
+    db = TracedDatabaseManager(path)
+    assert not [sql for sql in statements if 'DROP TABLE' in sql]
+    assert not [sql for sql in statements if 'INSERT INTO diaries_fts (' in sql or 'INSERT INTO diaries_grams (' in sql]
+    assert len(db.search_diaries('比赛')) == 1
+    db.close()
@@ -0,0 +1,39 @@
+"""
+list_diaries 的键集分页
+"""
+
+import pytest
+
+
+def test_list_diaries_pages_match_get_all(corpus_db):
+    db = corpus_db
+    paged = []
+    after = None
+    while True:
+        page = db.list_diaries(after, 11)
+        if not page:
+            break
+        paged.extend(diary['id'] for diary in page)
+        after = db.page_cursor(page[-1])
+    assert paged == [diary['id'] for diary in db.get_all_diaries()]
+
+
+@pytest.mark.parametrize('mood, is_important', [('happy', None), (None, True), ('sad', False)])
+def test_filtered_pages_and_counts(corpus_db, mood, is_important):
+    db = corpus_db
+    expected = [
+        diary['id'] for diary in db.get_all_diaries()
+        if (mood is None or diary['mood'] == mood) and (is_important is None or diary['is_important'] == is_important)
+    ]
+    assert expected
+    paged = []
+    after = None
+    while True:
+        page = db.list_diaries(after, 9, mood=mood, is_important=is_important)
+        if not page:
+            break
+        paged.extend(diary['id'] for diary in page)
+        after = db.page_cursor(page[-1])
+    assert paged == expected
+    assert db.count_diaries(mood=mood, is_important=is_important) == len(expected)
+    assert db.count_diaries() == 300
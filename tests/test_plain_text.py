@@ -0,0 +1,49 @@
+"""
+html_to_text：从 QTextEdit 的 HTML 提取纯文本
+"""
+
+import pytest
+
+from main import html_to_text
+
+HEAD = (
+    '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+    '<html><head><meta name="qrichtext" content="1" /><title>不是正文</title>'
+    '<style type="text/css">\np, li { white-space: pre-wrap; }\n</style>'
+    '<script>var x = "也不是";</script></head><body>\n'
+)
+
+
+@pytest.mark.parametrize('html, text', [
+    ('<p>a &lt; b &amp; c&nbsp;d &#x4e2d;&#25991; &quot;引号&quot;</p>', 'a < b & c\xa0d 中文 "引号"'),
+    (HEAD + '<p>正文</p></body></html>', '正文'),
+    ('<p>一</p>\n<p>二<br />三<br>四</p>', '一\n二\n三\n四'),
+    ('<ul>\n<li>甲</li>\n<li>乙</li></ul>\n<p>后</p>', '甲\n乙\n后'),
+    ('<ol>\n<li>一\n<ul>\n<li>子</li></ul></li>\n<li>二</li></ol>', '一\n子\n二'),
+    ('<p style="-qt-paragraph-type:empty;"><br /></p>\n<p>a</p>', 'a'),
+    ('<p>  缩进和\t制表符 </p>', '  缩进和\t制表符 '),
+])
+def test_html_to_text(html, text):
+    assert html_to_text(html) == text
+
+
+@pytest.mark.parametrize('text', ['1<2', 'a < b', 'x<y and z', '<3 you', 'Tom & Jerry &amp; 没有标签', ''])
+def test_plain_text_round_trips(text):
+    assert html_to_text(text) == text
+
+
+@pytest.mark.parametrize('source', [
+    ('plain', '第一段 a<b>c &amp; 1<2\n\n第三段\t制表符  两个空格'),
+    ('html', '<h1>标题</h1><p>正文<b>加粗</b><br>换行</p><ol><li>一<ul><li>子</li></ul></li><li>二</li></ol>'),
+    ('html', '<p>一</p><ul><li>甲</li><li>乙</li></ul><p>二<br>三</p>'),
+])
+def test_matches_qt_plain_text(qapp, source):
+    from PyQt6.QtGui import QTextDocument
+    
+    kind, value = source
+    document = QTextDocument()
+    if kind == 'plain':
+        document.setPlainText(value)
+    else:
+        document.setHtml(value)
+    assert html_to_text(document.toHtml()) == document.toPlainText()
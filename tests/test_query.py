@@ -0,0 +1,61 @@
+"""
+DiaryQuery：各种筛选和排序的键集分页与 Python 里的对照结果一致
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from main import DatabaseManager, DiaryQuery
+
+
+QUERIES = [
+    DiaryQuery(),
+    DiaryQuery(sort='newest'),
+    DiaryQuery(sort='oldest'),
+    DiaryQuery(sort='longest'),
+    DiaryQuery(is_important=True),
+    DiaryQuery(is_important=False, sort='longest'),
+    DiaryQuery(moods=['happy', 'sad'], min_words=50, max_words=400),
+    DiaryQuery(recent_days=200, sort='oldest'),
+    DiaryQuery(date_from=date.today() - timedelta(days=400), date_to=date.today() - timedelta(days=30)),
+    DiaryQuery(text='图书馆', sort='newest'),
+]
+
+
+def expected_ids(db: DatabaseManager, query: DiaryQuery) -> list:
+    """在 Python 里筛选、排序，作为对照"""
+    rows = [dict(row) for row in db.get_connection().execute(
+        'SELECT id, title, created_date, mood, is_important, word_count, plain_text FROM diaries'
+    )]
+    rows = [row for row in rows if query.matches(row)]
+    if query.text:
+        rows = [row for row in rows if query.text in row['title'] + row['plain_text']]
+    rows.sort(key=query.sort_key, reverse=query.descending)
+    return [row['id'] for row in rows]
+
+
+@pytest.mark.parametrize('query', QUERIES, ids=lambda q: str(q.to_dict()))
+def test_keyset_pages_cover_query_in_order(corpus_db, query):
+    db = corpus_db
+    expected = expected_ids(db, query)
+    assert expected
+    assert [diary['id'] for diary in db.query_diaries(query, limit=None)] == expected
+    
+    # 每页 7 条（同一天、同字数的日记会被拆到两页）
+    paged = []
+    after = None
+    while True:
+        page = db.query_diaries(query, after, 7)
+        if not page:
+            break
+        paged.extend(diary['id'] for diary in page)
+        after = query.cursor_of(page[-1])
+    assert paged == expected
+
+
+def test_query_round_trips_through_dict():
+    query = DiaryQuery(moods=['sad', 'happy'], is_important=True, recent_days=7, min_words=10, text='图书馆', sort='oldest')
+    assert DiaryQuery.from_dict(query.to_dict()).to_dict() == query.to_dict()
+    with pytest.raises(ValueError):
+        DiaryQuery(sort='random')
@@ -0,0 +1,121 @@
+"""
+查询计时：语句指纹、耗时分布、报表和慢查询日志
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+from query_profiler import HISTOGRAM_BOUNDS_MS, QueryProfiler, fingerprint
+
+
+@pytest.mark.parametrize('sql, expected', [
+    ("SELECT * FROM diaries WHERE title = 'it''s' AND mood = \"happy\"",
+     'SELECT * FROM diaries WHERE title = ? AND mood = "happy"'),
+    ('SELECT id FROM t1 WHERE x > -3.5 AND y = 42 AND t1.c2 = col3 - 1', 'SELECT id FROM t1 WHERE x > ? AND y = ? AND t1.c2 = col3 - ?'),
+    ('SELECT id FROM diaries WHERE id IN (1, 2, 3)', 'SELECT id FROM diaries WHERE id IN (?, ...)'),
+    ('SELECT id FROM diaries WHERE id in (?)', 'SELECT id FROM diaries WHERE id in (?, ...)'),
+    ('SELECT id FROM diaries WHERE id IN(?,?,  ?)', 'SELECT id FROM diaries WHERE id IN (?, ...)'),
+    ('INSERT INTO t (a, b) VALUES (?, ?)', 'INSERT INTO t (a, b) VALUES (?, ...)'),
+    ('SELECT search_snippet(plain_text, ?)\n   FROM diaries\n  LIMIT ?', 'SELECT search_snippet(plain_text, ?) FROM diaries LIMIT ?'),
+])
+def test_fingerprint(sql, expected):
+    assert fingerprint(sql) == expected
+
+
+def test_in_lists_of_any_length_share_a_fingerprint():
+    profiler = QueryProfiler()
+    for n in (1, 2, 10):
+        sql = f"SELECT id FROM diaries WHERE id IN ({', '.join('?' * n)})"
+        profiler.record(None, sql, None, 0.001, n)
+    [entry] = profiler.snapshot()
+    assert (entry['count'], entry['rows']) == (3, 13)
+
+
+def test_histogram_and_percentiles():
+    profiler = QueryProfiler(slow_ms=10)
+    # 边界值落在以它为上界的桶里
+    for ms in [0.01, 0.05, 0.06] + [1] * 16 + [10, 2000]:
+        profiler.record(None, 'SELECT 1', None, ms / 1000, 1)
+    [entry] = profiler.snapshot()
+    histogram = dict(zip(HISTOGRAM_BOUNDS_MS, entry['histogram']))
+    assert (histogram[0.05], histogram[0.1], histogram[1], histogram[10], histogram[2500]) == (2, 1, 16, 1, 1)
+    assert entry['count'] == 21 and sum(entry['histogram']) == 21
+    assert entry['p50_ms'] == 1
+    assert entry['p95_ms'] == 10
+    assert entry['max_ms'] == pytest.approx(2000)
+    assert entry['avg_ms'] == pytest.approx(entry['total_ms'] / 21)
+    # 阈值含等于
+    assert profiler.slow_count == 2
+
+
+def test_report_orders_by_total_time(tmp_path):
+    profiler = QueryProfiler()
+    profiler.record(None, 'SELECT a FROM t WHERE id = 1', None, 0.002, 1)
+    profiler.record(None, 'SELECT a FROM t WHERE id = 2', None, 0.002, 1)
+    profiler.record(None, 'SELECT b FROM t', None, 0.003, 5)
+    lines = profiler.report().splitlines()
+    assert '语句' in lines[0]
+    assert lines[1].endswith('SELECT a FROM t WHERE id = ?') and lines[1].split()[0] == '2'
+    assert lines[2].endswith('SELECT b FROM t')
+    assert len(profiler.report(limit=1).splitlines()) == 2
+    profiler.reset()
+    assert profiler.snapshot() == [] and profiler.slow_count == 0
+
+
+def test_slow_log_with_query_plan(tmp_path):
+    log_path = str(tmp_path / 'slow.log')
+    profiler = QueryProfiler(slow_ms=0, log_path=log_path)
+    conn = profiler.connect(str(tmp_path / 'd.db'))
+    conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.executemany('INSERT INTO t (name) VALUES (?)', [('a',), ('b',)])
+    assert conn.execute('SELECT name FROM t WHERE id = ?', (2,)).fetchall() == [('b',)]
+    conn.executemany('INSERT INTO t (name) VALUES (?)', iter([('c',)]))
+    conn.close()
+    profiler.close()
+    
+    with open(log_path, encoding='utf-8') as f:
+        log = f.read()
+    assert 'SQL: SELECT name FROM t WHERE id = ?' in log
+    assert '参数: (2,)' in log
+    assert 'SEARCH t USING INTEGER PRIMARY KEY' in log
+    # executemany 用第一组参数取执行计划；参数是迭代器时没有样本
+    assert "参数: ('a',)" in log
+    assert '执行计划: 无参数样本' in log
+    # CREATE TABLE 不能 EXPLAIN，只记录语句
+    assert 'SQL: CREATE TABLE t' in log
+    
+    stats = {entry['sql']: entry for entry in profiler.snapshot()}
+    assert stats['SELECT name FROM t WHERE id = ?']['rows'] == 1
+    assert stats['INSERT INTO t (name) VALUES (?, ...)']['count'] == 2
+
+
+def test_only_slow_statements_are_logged(tmp_path):
+    log_path = str(tmp_path / 'slow.log')
+    profiler = QueryProfiler(slow_ms=5, log_path=log_path)
+    conn = sqlite3.connect(':memory:')
+    profiler.record(conn, "SELECT 'fast'", None, 0.004, 1)
+    profiler.record(conn, "SELECT 'slow'", None, 0.005, 1)
+    profiler.close()
+    # 关闭后只统计，不再写日志
+    profiler.record(conn, "SELECT 'after_close'", None, 1.0, 1)
+    conn.close()
+    with open(log_path, encoding='utf-8') as f:
+        log = f.read()
+    assert "SQL: SELECT 'slow'" in log
+    assert 'fast' not in log and 'after_close' not in log
+    assert profiler.slow_count == 2
+
+
+def test_slow_log_rotates(tmp_path):
+    log_path = str(tmp_path / 'slow.log')
+    profiler = QueryProfiler(slow_ms=0, log_path=log_path, max_bytes=400, backup_count=2)
+    conn = sqlite3.connect(':memory:')
+    for i in range(50):
+        profiler.record(conn, f"SELECT {i}, 'x'", None, 0.001, 1)
+    conn.close()
+    profiler.close()
+    names = sorted(os.listdir(tmp_path))
+    assert names == ['slow.log', 'slow.log.1', 'slow.log.2']
+    assert all(os.path.getsize(tmp_path / name) <= 400 for name in names)
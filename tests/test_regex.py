@@ -0,0 +1,111 @@
+"""
+正则搜索：n-gram 预筛选不能漏掉真正匹配的日记
+"""
+
+import random
+import re
+
+import pytest
+
+from main import DiaryQuery, regex_prefix, required_grams, search_tokens, fuzzy_grams
+
+ALPHABET = list('比赛年度计划图书馆天气不错') + list('abcNBAxyz') + list('0123456789') + [' ', '，', '_', '-']
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+@pytest.fixture
+def corpus(db):
+    """混排中英文、数字和标点的随机日记"""
+    rng = random.Random(20)
+    texts = ['今天去看NBA比赛', '写了2024年度计划', '2024年3月5日 天气不错', 'Library_开门了']
+    texts += [random_text(rng, rng.randint(5, 40)) for _ in range(150)]
+    for i, text in enumerate(texts):
+        db.add_diary(random_text(rng, 4) if i % 3 else text[:6], text)
+    return rng, texts
+
+
+def brute_force(db, pattern: str) -> list:
+    """不预筛选，逐行执行 REGEXP"""
+    rows = db.get_connection().execute(
+        'SELECT id FROM diaries WHERE title REGEXP ? OR plain_text REGEXP ? ORDER BY id DESC', (pattern, pattern)
+    )
+    return [row[0] for row in rows]
+
+
+def brute_force_filtered(db, pattern: str, query: DiaryQuery) -> list:
+    """逐行执行 REGEXP，再按 query 的条件过滤"""
+    rows = db.get_connection().execute(
+        'SELECT id, mood, is_important, created_date, word_count FROM diaries '
+        'WHERE title REGEXP ? OR plain_text REGEXP ? ORDER BY id DESC', (pattern, pattern)
+    )
+    return [row['id'] for row in rows if query.matches(dict(row))]
+
+
+def sample_patterns(rng: random.Random, texts: list) -> list:
+    patterns = ['比赛', '年度计划', 'BA比', '4年', '3月', r'\d+年', 'N.A', 'Library_开', '(?i)nba', '赛$', '天气|计划']
+    for _ in range(200):
+        text = rng.choice(texts)
+        start = rng.randrange(len(text))
+        literal = re.escape(text[start:start + rng.randint(1, 6)])
+        patterns.append(literal + rng.choice(['', '', '.?', r'\d*', '[a-z]']))
+    return patterns
+
+
+def test_regex_search_matches_brute_force(db, corpus):
+    rng, texts = corpus
+    for pattern in sample_patterns(rng, texts):
+        expected = brute_force(db, pattern)
+        assert [diary['id'] for diary in db.regex_search(pattern)] == expected, pattern
+        assert [diary['id'] for diary in db.regex_search(pattern, limit=3)] == expected[:3], pattern
+
+
+def test_parallel_regex_scan_matches_brute_force(db, corpus):
+    rng, texts = corpus
+    db.REGEX_PARALLEL_MIN_ROWS = 1
+    db.REGEX_WORKERS = 3
+    for pattern in sample_patterns(rng, texts)[:50]:
+        assert [diary['id'] for diary in db.regex_search(pattern, parallel=True)] == brute_force(db, pattern), pattern
+
+
+def test_regex_search_applies_filters(db, corpus):
+    rng, texts = corpus
+    with db.get_connection() as conn:
+        conn.execute("UPDATE diaries SET is_important = id % 2, mood = CASE id % 3 WHEN 0 THEN 'happy' ELSE 'sad' END")
+    db.REGEX_PARALLEL_MIN_ROWS = 1
+    db.REGEX_WORKERS = 3
+    queries = [
+        DiaryQuery(is_important=True),
+        DiaryQuery(moods=['happy'], min_words=10),
+        DiaryQuery(moods=['sad'], is_important=False, sort='longest'),
+    ]
+    for pattern in sample_patterns(rng, texts)[:50]:
+        for query in queries:
+            expected = brute_force_filtered(db, pattern, query)
+            assert [diary['id'] for diary in db.regex_search(pattern, query=query)] == expected, pattern
+            assert [diary['id'] for diary in db.regex_search(pattern, limit=3, query=query)] == expected[:3], pattern
+            assert [diary['id'] for diary in db.regex_search(pattern, parallel=True, query=query)] == expected, pattern
+
+
+@pytest.mark.parametrize('pattern, prefix', [
+    (r'图书馆.*开门', '图书馆'),
+    (r'colou?r', 'colo'),
+    (r'^\bNBA比赛', 'NBA比赛'),
+    (r'a\.b\d', 'a.b'),
+    (r'x|y', ''),
+    (r'(?i)abc', ''),
+    (r'ab{2}', 'a'),
+])
+def test_regex_prefix(pattern, prefix):
+    assert regex_prefix(pattern) == prefix
+
+
+@pytest.mark.parametrize('text', ['NBA比赛', '2024年度计划', 'Library_开门了', 'ab12，比x'])
+def test_required_grams_are_indexed(text):
+    # 任何包含 literal 的文字，n-gram 文档里都有 literal 的全部必需 n-gram
+    indexed = fuzzy_grams(search_tokens('前缀' + text + '后缀'))
+    for start in range(len(text)):
+        for end in range(start + 1, len(text) + 1):
+            assert required_grams(text[start:end]) <= indexed, text[start:end]
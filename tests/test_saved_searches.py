@@ -0,0 +1,95 @@
+"""
+已保存的搜索：缓存的结果随数据版本更新
+"""
+
+import sqlite3
+
+import pytest
+
+from main import DatabaseManager, DiaryQuery
+
+
+SAVED = {
+    'happy': DiaryQuery(moods=['happy']),
+    'important_long': DiaryQuery(is_important=True, min_words=100, sort='longest'),
+    'library': DiaryQuery(text='图书馆', sort='oldest'),
+}
+
+
+def assert_saved_searches_fresh(db: DatabaseManager, ids: dict):
+    for name, query in SAVED.items():
+        got = [diary['id'] for diary in db.run_saved_search(ids[name])]
+        assert got == [diary['id'] for diary in db.query_diaries(query, limit=None)], name
+
+
+@pytest.fixture
+def saved(corpus_db):
+    ids = {name: corpus_db.save_search(name, query) for name, query in SAVED.items()}
+    assert_saved_searches_fresh(corpus_db, ids)
+    return ids
+
+
+def test_saved_search_uses_cache_until_data_changes(corpus_db, saved):
+    db = corpus_db
+    conn = db.get_connection()
+    version = db.data_version()
+    assert conn.execute('SELECT COUNT(*) FROM saved_searches WHERE data_version = ?', (version,)).fetchone()[0] == 3
+    
+    # 缓存的结果被篡改后仍原样返回，说明没有重新查询
+    conn.execute("UPDATE saved_searches SET result = '[]' WHERE id = ?", (saved['happy'],))
+    conn.commit()
+    assert db.run_saved_search(saved['happy']) == []
+    
+    db.add_diary('新', '<p>新的一天</p>', 'sad')
+    assert db.data_version() > version
+    # 有改动时只重算改动过的日记，篡改过的缓存不会被修好
+    assert db.run_saved_search(saved['happy']) == []
+    db.save_search('happy', SAVED['happy'])
+    assert_saved_searches_fresh(db, saved)
+
+
+def test_saved_search_follows_writes(corpus_db, saved):
+    db = corpus_db
+    happy = db.add_diary('图书馆', '<p>' + '字' * 150 + '</p>', 'happy', True)
+    assert_saved_searches_fresh(db, saved)
+    
+    db.update_diary(happy, '不相关', '<p>短</p>', 'sad', False)
+    assert_saved_searches_fresh(db, saved)
+    
+    first = db.run_saved_search(saved['important_long'])[0]['id']
+    db.delete_diary(first)
+    assert_saved_searches_fresh(db, saved)
+    
+    # 其他程序写入
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE diaries SET mood = 'happy' WHERE id IN (SELECT id FROM diaries ORDER BY id LIMIT 5)")
+    conn.execute('''
+        INSERT INTO diaries (title, content, mood, is_important, created_date, word_count)
+        VALUES ('去图书馆', '<p>外部写入</p>', 'happy', 1, date('now'), 500)
+    ''')
+    conn.commit()
+    conn.close()
+    assert_saved_searches_fresh(db, saved)
+
+
+def test_saved_search_recomputes_after_many_changes(corpus_db, saved):
+    db = corpus_db
+    db.SAVED_SEARCH_MAX_CHANGES = 3
+    ids = [row[0] for row in db.get_connection().execute('SELECT id FROM diaries ORDER BY id DESC LIMIT 20')]
+    db.update_diaries([
+        {'id': i, 'title': '图书馆', 'content': '<p>' + '字' * 200 + '</p>', 'mood': 'happy', 'is_important': True}
+        for i in ids
+    ])
+    assert_saved_searches_fresh(db, saved)
+
+
+def test_saved_search_pages_and_management(corpus_db, saved):
+    db = corpus_db
+    full = [diary['id'] for diary in db.run_saved_search(saved['happy'])]
+    assert [diary['id'] for diary in db.run_saved_search(saved['happy'], limit=5, offset=3)] == full[3:8]
+    
+    assert [search['name'] for search in db.list_saved_searches()] == sorted(SAVED)
+    assert db.delete_saved_search(saved['library'])
+    assert not db.delete_saved_search(saved['library'])
+    with pytest.raises(KeyError):
+        db.run_saved_search(saved['library'])
@@ -0,0 +1,74 @@
+"""
+全文检索的分词和 search_diaries
+"""
+
+import pytest
+
+from main import DatabaseManager, build_fts_query, search_tokens
+
+
+@pytest.mark.parametrize('text, tokens', [
+    ('今天去看NBA比赛', '今天 天去 去看 看 nba 比赛 赛'),
+    ('2024年3月5日 天气不错', '2024 年 3 月 5 日 天气 气不 不错 错'),
+    ('写了2024年度计划', '写了 了 2024 年度 度计 计划 划'),
+    ('Hello, World_2', 'hello world 2'),
+    ('图书馆', '图书 书馆 馆'),
+    ('カタカナとKorean한국어', 'カタ タカ カナ ナと と korean 한국 국어 어'),
+])
+def test_search_tokens_split_at_script_boundaries(text, tokens):
+    assert search_tokens(text) == tokens
+
+
+@pytest.mark.parametrize('keyword, query', [
+    ('比赛', '"比赛"*'),
+    ('3月', '"3 月"*'),
+    ('NBA比', '"nba 比"*'),
+    ('年度计划', '"年度 度计 计划"*'),
+    ('"图书馆 开门"', '"图书 书馆 馆 开门"'),
+    ('图书 python', '"图书"* AND "python"*'),
+    ('，。！', ''),
+])
+def test_build_fts_query(keyword, query):
+    assert build_fts_query(keyword) == query
+
+
+MIXED = [
+    ('周末', '今天去看NBA比赛，很精彩'),
+    ('计划', '写了2024年度计划'),
+    ('天气', '2024年3月5日 天气不错'),
+    ('Notes', 'Finished the Python3教程 today'),
+]
+
+
+def like_search(db: DatabaseManager, keyword: str) -> set:
+    """之前的 LIKE 搜索（英文不区分大小写），作为对照"""
+    rows = db.get_connection().execute(
+        'SELECT id FROM diaries WHERE title LIKE ? OR plain_text LIKE ?', (f'%{keyword}%', f'%{keyword}%')
+    )
+    return {row[0] for row in rows}
+
+
+@pytest.mark.parametrize('keyword', ['比赛', 'NBA', 'nba比赛', '年', '3月', '5日', '年度计划', '2024', '教程', 'python3'])
+def test_mixed_script_search_matches_like(db, add, keyword):
+    for title, content in MIXED:
+        add(title, content)
+    found = {diary['id'] for diary in db.search_diaries(keyword)}
+    assert found and found == like_search(db, keyword)
+
+
+@pytest.mark.parametrize('first_batch, limit, offset', [
+    (None, None, 0), (7, None, 0), (7, None, 5), (7, 20, 3), (7, 7, 0), (7, 5, 0), (500, None, 0),
+])
+def test_iter_search_batches_follow_ranked_order(corpus_db, first_batch, limit, offset):
+    ranked = [diary['id'] for diary in corpus_db.search_diaries('的')]
+    assert len(ranked) > 30
+    batches = list(corpus_db.iter_search('的', batch_size=10, first_batch=first_batch, limit=limit, offset=offset))
+    assert all(batches)
+    if first_batch:
+        assert len(batches[0]) == min(first_batch, len(ranked) - offset, limit or first_batch)
+    expected = ranked[offset:None if limit is None else offset + limit]
+    assert [diary['id'] for batch in batches for diary in batch] == expected
+
+
+def test_iter_search_without_hits_yields_nothing(corpus_db):
+    assert list(corpus_db.iter_search('不存在的词xyz', first_batch=5)) == []
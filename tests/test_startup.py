@@ -0,0 +1,71 @@
+"""
+启动计时日志：写在数据库旁边，写入失败时在状态栏提示
+"""
+
+import os
+
+import pytest
+
+from main import MyDiaryApp, StartupLog
+from tests.helpers import wait_until
+
+
+def test_written_once_when_all_phases_are_marked(tmp_path):
+    path = str(tmp_path / 'startup.log')
+    startup = StartupLog(path)
+    for phase in StartupLog.PHASES[:-1]:
+        startup.mark(phase)
+    assert not os.path.exists(path)
+    startup.mark(StartupLog.PHASES[-1])
+    startup.mark(StartupLog.PHASES[0])
+    startup.write()
+    
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[0].endswith('启动')
+    assert [line.split()[0] for line in lines[1:]] == list(StartupLog.PHASES)
+
+
+def test_without_path_nothing_is_written(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    startup = StartupLog()
+    startup.write()
+    assert os.listdir(tmp_path) == []
+
+
+def test_write_errors_are_raised(tmp_path):
+    with pytest.raises(OSError):
+        StartupLog(str(tmp_path)).write()
+
+
+@pytest.fixture
+def window(qapp, tmp_path, monkeypatch):
+    """在临时目录里启动的主窗口（数据库用默认的相对路径）"""
+    monkeypatch.chdir(tmp_path)
+    windows = []
+    
+    def create(startup):
+        windows.append(MyDiaryApp(startup))
+        return windows[-1]
+    
+    yield create
+    for window in windows:
+        window.close()
+
+
+def test_log_is_written_next_to_the_database(qapp, tmp_path, window):
+    app = window(StartupLog())
+    assert app.startup.path == os.path.splitext(app.db.db_path)[0] + '_startup.log'
+    for phase in ('window_shown', 'event_loop'):
+        app.mark_startup(phase)
+    wait_until(qapp, lambda: app.startup.written)
+    assert os.path.exists(tmp_path / 'mydiary_final_startup.log')
+
+
+def test_write_failure_is_shown_in_status_bar(qapp, tmp_path, window):
+    os.mkdir(tmp_path / 'not_a_file.log')
+    app = window(StartupLog(str(tmp_path / 'not_a_file.log')))
+    for phase in ('window_shown', 'event_loop'):
+        app.mark_startup(phase)
+    wait_until(qapp, lambda: app.startup.written)
+    assert app.status_bar.currentMessage().startswith('启动日志写入失败')
@@ -0,0 +1,49 @@
+"""
+汇总表：触发器维护的统计数字和直接聚合的结果一致
+"""
+
+import sqlite3
+from datetime import date
+
+from tests.helpers import assert_stats_consistent
+
+
+def test_stats_rollups_follow_every_write(db, add):
+    first = add('一', '<p>一二三</p>', 'happy')
+    second = add('二', '<p>四五</p>', 'sad')
+    add('三', '<p>六</p>')
+    assert_stats_consistent(db)
+    assert db.get_statistics() == {'total_count': 3, 'total_words': 6, 'avg_words': 2}
+    
+    db.update_diary(first, '一', '<p>一二三四五六七</p>', 'sad')
+    assert_stats_consistent(db)
+    assert dict(db.get_mood_distribution()) == {'sad': 2, 'neutral': 1}
+    
+    db.delete_diary(second)
+    assert_stats_consistent(db)
+    
+    # 其他程序直接改日期和心情
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE diaries SET created_date = '2020-01-01', mood = NULL WHERE id = ?", (first,))
+    conn.commit()
+    conn.close()
+    assert_stats_consistent(db)
+    assert dict(db.get_mood_distribution()) == {'neutral': 1}
+
+
+def test_stats_rollups_after_bulk_writes(corpus_db):
+    db = corpus_db
+    assert_stats_consistent(db)
+    ids = [row[0] for row in db.get_connection().execute('SELECT id FROM diaries LIMIT 50')]
+    db.update_diaries([{'id': i, 'title': 't', 'content': '<p>改</p>', 'mood': 'angry', 'is_important': True} for i in ids])
+    assert_stats_consistent(db)
+    for diary_id in ids[:10]:
+        db.delete_diary(diary_id)
+    assert_stats_consistent(db)
+    assert db.get_statistics()['total_count'] == 290
+
+
+def test_word_trend_reads_daily_rollup(db, add):
+    add('今天', '<p>一二三</p>')
+    add('今天', '<p>四五</p>')
+    assert db.get_word_trend(30) == [(str(date.today()), 5)]
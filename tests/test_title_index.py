@@ -0,0 +1,82 @@
+"""
+标题快速跳转：拼音首字母、标题前缀索引和增量更新
+"""
+
+import pytest
+
+from main import TitleIndex, pinyin_initials, title_keys
+
+ROWS = [
+    (1, '日常：图书馆', '2024-01-01'),
+    (2, '日记', '2024-01-02'),
+    (3, 'Notes #12', '2024-01-03'),
+    (4, '日常：图书馆', '2024-01-04'),
+]
+
+
+@pytest.mark.parametrize('text, initials', [
+    ('图书馆', 'tsg'),
+    ('日常 ABC', 'rc ABC'),
+    ('123', '123'),
+])
+def test_pinyin_initials(text, initials):
+    assert pinyin_initials(text) == initials
+
+
+def test_title_keys_include_segments_and_initials():
+    assert title_keys('日常：图书馆') == {'日常:图书馆', '图书馆', 'rc:tsg', 'tsg'}
+    assert title_keys('Notes #12') == {'notes #12', '12'}
+
+
+@pytest.mark.parametrize('prefix, ids', [
+    ('日', [4, 1, 2]),      # 同一个键里新的在前
+    ('日常', [4, 1]),
+    ('图书', [4, 1]),
+    ('tsg', [4, 1]),
+    ('rj', [2]),
+    ('ＮＯＴ', [3]),        # 全角字母
+    ('12', [3]),
+    ('不存在', []),
+    ('', []),
+])
+def test_search_prefix(prefix, ids):
+    index = TitleIndex(ROWS)
+    assert [row[0] for row in index.search(prefix)] == ids
+
+
+def test_search_limit():
+    index = TitleIndex((i, f'日记 {i}', '2024-01-01') for i in range(100))
+    # 按键的字母顺序
+    assert [row[0] for row in index.search('日记', limit=5)] == [0, 1, 10, 11, 12]
+
+
+def test_add_remove_and_apply_change():
+    index = TitleIndex(ROWS)
+    index.add(5, '旅行计划', '2024-02-01')
+    assert [row[0] for row in index.search('lx')] == [5]
+    
+    index.apply_change({'op': 'update', 'id': 5, 'row': {'id': 5, 'title': '读书笔记', 'created_date': '2024-02-01'}})
+    assert index.search('lx') == []
+    assert index.search('dsbj') == [(5, '读书笔记', '2024-02-01')]
+    
+    index.apply_change({'op': 'delete', 'id': 1, 'row': None})
+    assert [row[0] for row in index.search('tsg')] == [4]
+    index.remove(4)
+    index.remove(4)
+    assert index.search('图书馆') == [] and len(index) == 3
+    # 删掉最后一篇用到的键后，键数组里也没有它
+    assert '图书馆' not in index._keys
+
+
+def test_load_title_index_follows_database(db, add):
+    first = add('日常：图书馆', '<p>正文</p>')
+    index = db.load_title_index()
+    assert [row[0] for row in index.search('tsg')] == [first]
+    
+    changes = []
+    db.add_listener(changes.append)
+    second = add('图书馆闭馆', '<p>正文</p>')
+    db.delete_diary(first)
+    for change in changes:
+        index.apply_change(change)
+    assert [row[0] for row in index.search('图书馆')] == [second]